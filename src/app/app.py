@@ -8,34 +8,30 @@ Provides a beautiful interface for:
 4. Displaying results with expandable components
 """
 
-import json
 import logging
 import sys
+from html import escape
 from pathlib import Path
+from typing import Dict, Final
 
+import pandas as pd
 import streamlit as st
+from pydantic_core import to_json
 
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from src.core.criterion_matching.matcher import CriteriaMatcher
 from src.core.pipeline import run_trial_matching_pipeline
+from src.core.target_identification.search import ClinicalTrialSearcher
+from src.models.schemas import TrialMatchResult
 from src.settings import settings
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Page configuration
-st.set_page_config(
-    page_title=settings.streamlit_title,
-    page_icon="🏥",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
-
-# Custom CSS for better styling
-st.markdown(
-    """
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -68,21 +64,130 @@ st.markdown(
         text-align: center;
     }
 </style>
-""",
-    unsafe_allow_html=True,
+"""
+
+SAMPLE_PROFILE_PATH = "data/patient_data/patient.1.1.txt"
+
+ELIGIBILITY_ICONS: Final[Dict[str, str]] = {
+    "eligible": "✅",
+    "ineligible": "❌",
+    "unknown": "❓",
+}
+ELIGIBILITY_COLORS: Final[Dict[str, str]] = {
+    "eligible": "#28a745",
+    "ineligible": "#dc3545",
+    "unknown": "#ffc107",
+}
+
+# Page configuration
+st.set_page_config(
+    page_title=settings.streamlit_title,
+    page_icon="🏥",
+    layout="wide",
+    initial_sidebar_state="expanded",
 )
 
+# Custom CSS for better styling
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_searcher() -> ClinicalTrialSearcher:
+    """Create the trial searcher once per process so its ES client is reused."""
+    return ClinicalTrialSearcher()
+
+
+@st.cache_resource(show_spinner=False)
+def get_matcher() -> CriteriaMatcher:
+    """Create the criteria matcher once per process."""
+    return CriteriaMatcher()
+
+
+@st.cache_data(show_spinner=False)
+def load_sample_profile(path: str) -> str:
+    """Read a sample patient profile once and reuse it across reruns."""
+    with open(path, "r") as f:
+        return f.read()
+
 
 def get_eligibility_icon(classification: str) -> str:
     """Get appropriate icon for eligibility classification."""
-    icons = {"eligible": "✅", "ineligible": "❌", "unknown": "❓"}
-    return icons.get(classification, "❓")
+    return ELIGIBILITY_ICONS.get(classification, "❓")
 
 
 def get_eligibility_color(classification: str) -> str:
     """Get appropriate color for eligibility classification."""
-    colors = {"eligible": "#28a745", "ineligible": "#dc3545", "unknown": "#ffc107"}
-    return colors.get(classification, "#6c757d")
+    return ELIGIBILITY_COLORS.get(classification, "#6c757d")
+
+
+def _result_cache_key(result: TrialMatchResult):
+    """Identify a result cheaply so cached renders skip hashing its contents."""
+    return (result.trial_id, result.created_at, result.match_score)
+
+
+@st.cache_data(
+    show_spinner=False,
+    max_entries=256,
+    hash_funcs={TrialMatchResult: _result_cache_key},
+)
+def build_criteria_table(result: TrialMatchResult) -> pd.DataFrame:
+    """Tabulate the individually evaluated criteria of a trial."""
+    matches = [m for m in result.criteria_matches if m.criteria_type != "whole"]
+    return pd.DataFrame(
+        {
+            "": [get_eligibility_icon(m.classification) for m in matches],
+            "Criterion": [m.criteria_text for m in matches],
+            "Status": [m.classification.title() for m in matches],
+            "Reason": [m.reasoning or "" for m in matches],
+        }
+    )
+
+
+@st.cache_data(
+    show_spinner=False,
+    max_entries=256,
+    hash_funcs={TrialMatchResult: _result_cache_key},
+)
+def render_trial_card(result: TrialMatchResult) -> str:
+    """Render the whole-criteria assessments of a trial as one HTML block."""
+    items = []
+
+    for criteria_match in result.criteria_matches:
+        if criteria_match.criteria_type != "whole":
+            continue
+
+        classification = criteria_match.classification
+        lines = [
+            f"{get_eligibility_icon(classification)} "
+            "<strong>Complete Eligibility Criteria</strong>",
+            f"<strong>Status:</strong> {escape(classification.title())}",
+        ]
+        if criteria_match.reasoning:
+            lines.append(
+                "<strong>Overall Assessment:</strong> "
+                f"{escape(criteria_match.reasoning)}"
+            )
+
+        # Display additional whole criteria information
+        if criteria_match.extracted_info:
+            info = criteria_match.extracted_info
+            if "overall_score" in info:
+                lines.append(
+                    f"<strong>Overall Score:</strong> {info['overall_score']:.1%}"
+                )
+            if "key_factors" in info and info["key_factors"]:
+                key_factors = escape(", ".join(info["key_factors"][:3]))
+                lines.append(f"<strong>Key Factors:</strong> {key_factors}")
+            if "missing_information" in info and info["missing_information"]:
+                missing_info = escape(", ".join(info["missing_information"][:2]))
+                lines.append(f"<strong>Missing Info:</strong> {missing_info}")
+
+        items.append(
+            f'<div class="criteria-item {escape(classification)}">'
+            f"{'<br>'.join(lines)}</div>"
+        )
+
+    return "".join(items)
 
 
 def display_trial_results(pipeline_response):
@@ -94,90 +199,71 @@ def display_trial_results(pipeline_response):
         st.warning("No trials found matching the patient profile.")
         return
 
-    # Sort results by match score
-    sorted_results = sorted(results, key=lambda x: x.match_score, reverse=True)
-
-    # Display summary metrics
+    # Display summary metrics computed once by the pipeline
+    summary = pipeline_response.summary
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Total Trials", len(results))
+        st.metric("Total Trials", summary["total_trials"])
     with col2:
-        st.metric("Trials with Matches", sum(1 for r in results if r.match_score > 0))
+        st.metric("Trials with Matches", summary["trials_with_matches"])
     with col3:
-        avg_score = sum(r.match_score for r in results) / len(results) if results else 0
-        st.metric("Average Match Score", f"{avg_score:.1%}")
+        st.metric("Average Match Score", f"{summary['average_match_score']:.1%}")
     with col4:
-        best_score = max(r.match_score for r in results) if results else 0
-        st.metric("Best Match Score", f"{best_score:.1%}")
+        st.metric("Best Match Score", f"{summary['best_match_score']:.1%}")
 
     st.markdown("---")
 
-    # Display each trial
-    for i, result in enumerate(sorted_results):
-        # Trial header with basic info
-        st.markdown(
-            f"### 🏥 **{result.trial_id}** - Match Score: {result.match_score:.1%} ({result.eligible_criteria}/{result.total_criteria} criteria)"
-        )
+    # Display each trial; the pipeline already ranks them by match score
+    for result in results:
+        display_trial_result(result)
+
+
+def display_trial_result(result):
+    """Display a single trial matching result."""
+    # Trial header with basic info
+    st.markdown(
+        f"### 🏥 **{result.trial_id}** - Match Score: {result.match_score:.1%} ({result.eligible_criteria}/{result.total_criteria} criteria)"
+    )
 
-        col1, col2 = st.columns([2, 1])
+    col1, col2 = st.columns([2, 1])
 
-        with col1:
-            st.markdown(f"**Trial ID:** {result.trial_id}")
-            st.markdown(f"**Match Score:** {result.match_score:.1%}")
-            st.markdown(
-                f"**Eligible Criteria:** {result.eligible_criteria}/{result.total_criteria}"
+    with col1:
+        st.markdown(
+            f"**Trial ID:** {result.trial_id}  \n"
+            f"**Match Score:** {result.match_score:.1%}  \n"
+            f"**Eligible Criteria:** {result.eligible_criteria}/{result.total_criteria}"
+            + (
+                f"  \n*Stopped early after {len(result.criteria_matches)} criteria*"
+                if result.truncated
+                else ""
             )
+        )
 
-        with col2:
-            # Progress bar for match score
-            st.progress(result.match_score)
-
-            # Color-coded match score
-            if result.match_score >= 0.7:
-                st.success("High Match")
-            elif result.match_score >= 0.4:
-                st.warning("Medium Match")
-            else:
-                st.error("Low Match")
-
-        # Display criteria matches in a simple list
-        st.markdown("#### Criteria Analysis")
-
-        for criteria_match in result.criteria_matches:
-            icon = get_eligibility_icon(criteria_match.classification)
-
-            # Display as simple text with icons
-            if criteria_match.criteria_type == "whole":
-                st.write(f"{icon} **Complete Eligibility Criteria**")
-                st.write(f"**Status:** {criteria_match.classification.title()}")
-                if criteria_match.reasoning:
-                    st.write(f"**Overall Assessment:** {criteria_match.reasoning}")
-
-                # Display additional whole criteria information
-                if criteria_match.extracted_info:
-                    info = criteria_match.extracted_info
-                    if "overall_score" in info:
-                        st.write(f"**Overall Score:** {info['overall_score']:.1%}")
-                    if "key_factors" in info and info["key_factors"]:
-                        st.write(
-                            f"**Key Factors:** {', '.join(info['key_factors'][:3])}"
-                        )
-                    if "missing_information" in info and info["missing_information"]:
-                        st.write(
-                            f"**Missing Info:** {', '.join(info['missing_information'][:2])}"
-                        )
-            else:
-                st.write(
-                    f"{icon} **{criteria_match.criteria_text[:60]}{'...' if len(criteria_match.criteria_text) > 60 else ''}**"
-                )
-                st.write(f"**Status:** {criteria_match.classification.title()}")
-                if criteria_match.reasoning:
-                    st.write(f"**Reason:** {criteria_match.reasoning}")
+    with col2:
+        # Progress bar for match score
+        st.progress(result.match_score)
+
+        # Color-coded match score
+        if result.match_score >= 0.7:
+            st.success("High Match")
+        elif result.match_score >= 0.4:
+            st.warning("Medium Match")
+        else:
+            st.error("Low Match")
 
-            st.write("---")
+    # Criteria stay collapsed until requested, keeping long result lists light
+    with st.expander(f"Criteria Analysis ({len(result.criteria_matches)})"):
+        # Individual criteria go into one virtualised table
+        criteria_table = build_criteria_table(result)
+        if not criteria_table.empty:
+            st.dataframe(criteria_table, use_container_width=True, hide_index=True)
 
-        st.markdown("---")
+        whole_assessment = render_trial_card(result)
+        if whole_assessment:
+            st.markdown(whole_assessment, unsafe_allow_html=True)
+
+    st.markdown("---")
 
 
 def main():
@@ -200,12 +286,21 @@ def main():
         classification_mode = st.selectbox(
             "Classification Mode",
             ["individual", "whole"],
-            format_func=lambda x: "Individual Criteria"
-            if x == "individual"
-            else "Whole Criteria",
+            format_func=lambda x: (
+                "Individual Criteria" if x == "individual" else "Whole Criteria"
+            ),
             help="Individual: Evaluate each criterion separately. Whole: Evaluate all criteria together.",
         )
 
+        early_stop_threshold = st.slider(
+            "Early Stop Threshold",
+            0.0,
+            1.0,
+            0.0,
+            0.05,
+            help="Individual mode only: stop evaluating a trial once its match score can no longer reach this value. 0 evaluates every criterion.",
+        )
+
         st.markdown("---")
         st.markdown("### 📊 About")
         st.markdown(settings.streamlit_description)
@@ -226,8 +321,7 @@ def main():
         # Load sample profile button
         if st.button("📄 Load Sample Profile"):
             try:
-                with open("data/patient_data/patient.1.1.txt", "r") as f:
-                    patient_profile = f.read()
+                patient_profile = load_sample_profile(SAMPLE_PROFILE_PATH)
                 st.success("Sample profile loaded!")
             except FileNotFoundError:
                 st.error("Sample profile file not found!")
@@ -243,6 +337,21 @@ def main():
         if search_button and patient_profile.strip():
             with st.spinner("Running trial matching pipeline..."):
                 try:
+                    # Render each trial as soon as it is matched
+                    live_status = st.empty()
+                    live_results = st.empty()
+                    live_container = live_results.container()
+                    streamed_count = 0
+
+                    def show_partial_result(result):
+                        nonlocal streamed_count
+                        streamed_count += 1
+                        live_status.caption(
+                            f"Matched {streamed_count} trial(s) so far..."
+                        )
+                        with live_container:
+                            display_trial_result(result)
+
                     # Run the complete pipeline
                     pipeline_response = run_trial_matching_pipeline(
                         patient_profile=patient_profile,
@@ -251,8 +360,16 @@ def main():
                         skip_masking=True,
                         include_reasoning=True,
                         classification_mode=classification_mode,
+                        searcher=get_searcher(),
+                        matcher=get_matcher(),
+                        on_result=show_partial_result,
+                        early_stop_threshold=early_stop_threshold or None,
                     )
 
+                    # Replace the live view with the sorted, summarised results
+                    live_status.empty()
+                    live_results.empty()
+
                     st.success(
                         f"Pipeline completed in {pipeline_response.processing_time:.2f} seconds!"
                     )
@@ -284,7 +401,7 @@ def main():
                         ],
                     }
 
-                    results_json = json.dumps(results_dict, indent=2)
+                    results_json = to_json(results_dict, indent=2)
                     st.download_button(
                         label="📥 Download Results (JSON)",
                         data=results_json,
@@ -292,6 +409,17 @@ def main():
                         mime="application/json",
                     )
 
+                    # One trial per line, for tools that stream large result sets
+                    results_ndjson = b"".join(
+                        to_json(result) + b"\n" for result in results_dict["results"]
+                    )
+                    st.download_button(
+                        label="📥 Download Results (NDJSON)",
+                        data=results_ndjson,
+                        file_name="trial_matching_results.ndjson",
+                        mime="application/x-ndjson",
+                    )
+
                 except Exception as e:
                     st.error(f"Pipeline execution failed: {str(e)}")
                     logger.error(f"Pipeline error: {e}")
@@ -1,13 +1,71 @@
-import json
+import logging
+import string
+from concurrent.futures import ThreadPoolExecutor
 
-from src.utils.openai_utils import get_structured_llm_response
+from pydantic_core import from_json
+
+from src.models.schemas import BatchCriterionVerdict, CriterionVerdict
+from src.settings import settings
+from src.utils.cache_utils import JsonCache, content_digest, prompt_version
+from src.utils.openai_utils import (
+    JSON_OBJECT_RESPONSE_FORMAT,
+    get_structured_llm_response,
+    json_schema_response_format,
+)
 from src.utils.prompts import (
+    BATCH_CRITERIA_MATCHING_PROMPT,
+    BATCH_CRITERIA_MATCHING_SYSTEM,
     CRITERIA_MATCHING_PROMPT,
     CRITERIA_MATCHING_SYSTEM,
     WHOLE_CRITERIA_MATCHING_PROMPT,
     WHOLE_CRITERIA_MATCHING_SYSTEM,
 )
 
+logger = logging.getLogger(__name__)
+
+# Cached verdicts for (prompt version, patient profile, criterion) triples
+MATCH_CACHE_PREFIX = "match:"
+WHOLE_MATCH_CACHE_PREFIX = "match_whole:"
+MATCH_CACHE_TTL_SECONDS = 7 * 24 * 3600
+_match_cache = JsonCache(settings.match_cache_size, MATCH_CACHE_TTL_SECONDS)
+
+
+def compile_prompt(template):
+    """
+    Parse a ``str.format`` prompt template once.
+
+    Args:
+        template (str): Prompt template with ``{field}`` placeholders
+
+    Returns:
+        tuple: (literal text, field name or None) pairs in template order
+    """
+    return tuple(
+        (literal, field) for literal, field, _, _ in string.Formatter().parse(template)
+    )
+
+
+def render_prompt(compiled, **values):
+    """
+    Fill a template compiled by ``compile_prompt``.
+
+    Equivalent to ``template.format(**values)`` for plain placeholders, but
+    skips re-parsing the template on every call.
+
+    Args:
+        compiled (tuple): Output of ``compile_prompt``
+        **values: Text for each placeholder
+
+    Returns:
+        str: Rendered prompt
+    """
+    parts = []
+    for literal, field in compiled:
+        parts.append(literal)
+        if field is not None:
+            parts.append(values[field])
+    return "".join(parts)
+
 
 class CriteriaMatcher:
     def __init__(self):
@@ -15,11 +73,36 @@ class CriteriaMatcher:
         self.prompt_template = CRITERIA_MATCHING_PROMPT
         self.whole_criteria_system = WHOLE_CRITERIA_MATCHING_SYSTEM
         self.whole_criteria_prompt = WHOLE_CRITERIA_MATCHING_PROMPT
+        self.batch_system_message = BATCH_CRITERIA_MATCHING_SYSTEM
+        self.batch_prompt_template = BATCH_CRITERIA_MATCHING_PROMPT
+        self.batch_size = settings.criteria_batch_size
+        self.batch_max_tokens = settings.criteria_batch_max_tokens
+        self.max_concurrency = settings.llm_max_concurrency
+        self.early_stop_batch_size = settings.early_stop_batch_size
+        self.response_format = json_schema_response_format(CriterionVerdict)
+        self.batch_response_format = json_schema_response_format(BatchCriterionVerdict)
+        self._compiled_prompt = compile_prompt(self.prompt_template)
+        self._compiled_batch_prompt = compile_prompt(self.batch_prompt_template)
+        self._compiled_whole_prompt = compile_prompt(self.whole_criteria_prompt)
+
+        self._prompt_version = prompt_version(
+            self.system_message,
+            self.prompt_template,
+            self.batch_system_message,
+            self.batch_prompt_template,
+        )
+        self._whole_prompt_version = prompt_version(
+            self.whole_criteria_system, self.whole_criteria_prompt
+        )
 
     def match_criterion(self, patient_profile, criterion):
         """
         Evaluate whether a patient meets a specific criterion.
 
+        Results are cached in memory and in Redis keyed by the prompt version,
+        patient profile and criterion, so repeated evaluations skip the LLM
+        call.
+
         Args:
             patient_profile (str): Patient profile text
             criterion (str): Clinical trial criterion to evaluate
@@ -27,13 +110,17 @@ class CriteriaMatcher:
         Returns:
             dict: Matching result with classification and explanation
         """
-        prompt = self.prompt_template.format(
-            patient_profile=patient_profile, criterion=criterion
+        cache_key = self._cache_key(content_digest(patient_profile), criterion)
+        cached = _match_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = render_prompt(
+            self._compiled_prompt, patient_profile=patient_profile, criterion=criterion
         )
 
-        response_format = {"type": "json_object"}
         response = get_structured_llm_response(
-            prompt, self.system_message, response_format
+            prompt, self.system_message, self.response_format
         )
 
         # Parse the JSON response
@@ -44,21 +131,207 @@ class CriteriaMatcher:
             }
 
         try:
-            result = json.loads(response)
-            return {
-                "classification": result.get("classification", "unknown"),
-                "explanation": result.get("explanation", "No explanation provided"),
-            }
-        except json.JSONDecodeError:
+            result = CriterionVerdict.model_validate_json(response).model_dump()
+        except ValueError:
             return {
                 "classification": "unknown",
                 "explanation": "Invalid JSON response",
             }
 
+        _match_cache.set(cache_key, result)
+        return result
+
+    def match_criteria_batch(self, patient_profile, criteria_list):
+        """
+        Evaluate a patient against many criteria using batched LLM requests.
+
+        Args:
+            patient_profile (str): Patient profile text
+            criteria_list (list): List of clinical trial criteria
+
+        Returns:
+            list: Matching results in the same order as ``criteria_list``
+        """
+        verdicts = {}
+        for matches in self.iter_criteria_batches(patient_profile, criteria_list):
+            for match in matches:
+                verdicts[match["criterion"]] = match["result"]
+
+        return [
+            {"criterion": criterion, "result": verdicts[criterion]}
+            for criterion in criteria_list
+        ]
+
+    def iter_criteria_batches(self, patient_profile, criteria_list):
+        """
+        Evaluate criteria batch by batch, yielding results as they arrive.
+
+        Cached verdicts are read with a single cache lookup and yielded first.
+        The remaining criteria are sent as numbered lists of at most
+        ``batch_size`` items and ``batch_max_tokens`` approximate tokens, so
+        the patient profile is included once per request instead of once per
+        criterion. Up to ``max_concurrency`` requests are in flight at once;
+        their results are yielded in input order.
+
+        Args:
+            patient_profile (str): Patient profile text
+            criteria_list (list): List of clinical trial criteria
+
+        Yields:
+            list: Matching results for the criteria resolved by one step
+        """
+        profile_digest = content_digest(patient_profile)
+        cache_keys = [
+            self._cache_key(profile_digest, criterion) for criterion in criteria_list
+        ]
+        cached = _match_cache.get_many(cache_keys)
+
+        pending = [i for i, verdict in enumerate(cached) if verdict is None]
+        if criteria_list:
+            logger.info(
+                f"Criteria cache hits: {len(criteria_list) - len(pending)}"
+                f"/{len(criteria_list)}"
+            )
+
+        hits = [
+            {"criterion": criterion, "result": verdict}
+            for criterion, verdict in zip(criteria_list, cached)
+            if verdict is not None
+        ]
+        if hits:
+            yield hits
+
+        chunks = self._chunk_criteria([criteria_list[i] for i in pending], pending)
+        if not chunks:
+            return
+
+        # Requests run concurrently but are yielded in order
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(chunks))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self._match_criteria_chunk,
+                    patient_profile,
+                    [criteria_list[i] for i in indices],
+                )
+                for indices in chunks
+            ]
+            for indices, future in zip(chunks, futures):
+                matches = []
+                new_results = {}
+                for i, verdict in zip(indices, future.result()):
+                    if verdict is None:
+                        verdict = {
+                            "classification": "unknown",
+                            "explanation": "No valid response from LLM",
+                        }
+                    else:
+                        new_results[cache_keys[i]] = verdict
+                    matches.append({"criterion": criteria_list[i], "result": verdict})
+
+                _match_cache.set_many(new_results)
+                yield matches
+
+    def _chunk_criteria(self, criteria, indices):
+        """
+        Split criteria into consecutive chunks bounded by count and size.
+
+        Token counts are approximated as four characters per token, which is
+        enough to keep a chunk of unusually long criteria within the prompt
+        budget without loading a tokenizer.
+
+        Args:
+            criteria (list): Criteria to split
+            indices (list): Index of each criterion in the caller's list
+
+        Returns:
+            list: Chunks of indices, in input order
+        """
+        chunks = []
+        chunk, chunk_tokens = [], 0
+        for criterion, index in zip(criteria, indices):
+            tokens = len(criterion) // 4 + 1
+            if chunk and (
+                len(chunk) >= self.batch_size
+                or chunk_tokens + tokens > self.batch_max_tokens
+            ):
+                chunks.append(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(index)
+            chunk_tokens += tokens
+
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _match_criteria_chunk(self, patient_profile, criteria_chunk):
+        """
+        Evaluate one chunk of criteria in a single LLM request.
+
+        Args:
+            patient_profile (str): Patient profile text
+            criteria_chunk (list): Criteria to evaluate together
+
+        Returns:
+            list: One result dict per criterion in input order, or None for
+                criteria the LLM did not answer
+        """
+        numbered_criteria = "\n".join(
+            f"{i}. {criterion}" for i, criterion in enumerate(criteria_chunk, 1)
+        )
+        prompt = render_prompt(
+            self._compiled_batch_prompt,
+            patient_profile=patient_profile,
+            criteria=numbered_criteria,
+        )
+
+        response = get_structured_llm_response(
+            prompt, self.batch_system_message, self.batch_response_format
+        )
+
+        if response is None:
+            logger.warning("No response from LLM for criteria batch")
+            return [None] * len(criteria_chunk)
+
+        try:
+            verdicts = BatchCriterionVerdict.model_validate_json(response).results
+        except ValueError:
+            logger.warning("Invalid JSON response for criteria batch")
+            return [None] * len(criteria_chunk)
+
+        by_id = {verdict.id: verdict for verdict in verdicts}
+        return [
+            by_id[i].model_dump(exclude={"id"}) if i in by_id else None
+            for i in range(1, len(criteria_chunk) + 1)
+        ]
+
+    def _cache_key(self, profile_digest, criterion, whole=False):
+        """
+        Build the cache key for a criterion evaluated against a patient.
+
+        Args:
+            profile_digest (str): Digest of the patient profile
+            criterion (str): Criterion, or the joined criteria in whole mode
+            whole (bool): Whether the key is for a whole-criteria evaluation
+
+        Returns:
+            str: Redis key
+        """
+        if whole:
+            return WHOLE_MATCH_CACHE_PREFIX + content_digest(
+                self._whole_prompt_version, profile_digest, criterion
+            )
+        return MATCH_CACHE_PREFIX + content_digest(
+            self._prompt_version, profile_digest, criterion
+        )
+
     def match_whole_criteria(self, patient_profile, eligibility_criteria):
         """
         Evaluate whether a patient meets the entire eligibility criteria as a whole.
 
+        Results are cached the same way as ``match_criterion``.
+
         Args:
             patient_profile (str): Patient profile text
             eligibility_criteria (str): Complete eligibility criteria text
@@ -66,13 +339,21 @@ class CriteriaMatcher:
         Returns:
             dict: Matching result with classification and explanation
         """
-        prompt = self.whole_criteria_prompt.format(
-            patient_profile=patient_profile, eligibility_criteria=eligibility_criteria
+        cache_key = self._cache_key(
+            content_digest(patient_profile), eligibility_criteria, whole=True
+        )
+        cached = _match_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = render_prompt(
+            self._compiled_whole_prompt,
+            patient_profile=patient_profile,
+            eligibility_criteria=eligibility_criteria,
         )
 
-        response_format = {"type": "json_object"}
         response = get_structured_llm_response(
-            prompt, self.whole_criteria_system, response_format
+            prompt, self.whole_criteria_system, JSON_OBJECT_RESPONSE_FORMAT
         )
 
         # Parse the JSON response
@@ -83,15 +364,8 @@ class CriteriaMatcher:
             }
 
         try:
-            result = json.loads(response)
-            return {
-                "classification": result.get("classification", "unknown"),
-                "explanation": result.get("explanation", "No explanation provided"),
-                "overall_score": result.get("overall_score", 0.0),
-                "eligible_criteria_count": result.get("eligible_criteria_count", 0),
-                "total_criteria_count": result.get("total_criteria_count", 0),
-            }
-        except json.JSONDecodeError:
+            result = from_json(response)
+        except ValueError:
             return {
                 "classification": "unknown",
                 "explanation": "Invalid JSON response",
@@ -100,8 +374,22 @@ class CriteriaMatcher:
                 "total_criteria_count": 0,
             }
 
+        result = {
+            "classification": result.get("classification", "unknown"),
+            "explanation": result.get("explanation", "No explanation provided"),
+            "overall_score": result.get("overall_score", 0.0),
+            "eligible_criteria_count": result.get("eligible_criteria_count", 0),
+            "total_criteria_count": result.get("total_criteria_count", 0),
+        }
+        _match_cache.set(cache_key, result)
+        return result
+
     def match_all_criteria(
-        self, patient_profile, criteria_list, classification_mode="individual"
+        self,
+        patient_profile,
+        criteria_list,
+        classification_mode="individual",
+        early_stop_threshold=None,
     ):
         """
         Evaluate patient against criteria using specified classification mode.
@@ -110,9 +398,12 @@ class CriteriaMatcher:
             patient_profile (str): Patient profile text
             criteria_list (list): List of clinical trial criteria
             classification_mode (str): "individual" for per-criterion or "whole" for entire criteria
+            early_stop_threshold (float, optional): In individual mode, stop once
+                the share of eligible criteria can no longer reach this value
 
         Returns:
-            list: List of matching results
+            list: List of matching results (a prefix of ``criteria_list`` when
+                evaluation stopped early)
         """
         if classification_mode == "whole":
             # Join all criteria into one text and evaluate as a whole
@@ -121,12 +412,46 @@ class CriteriaMatcher:
             return [{"criterion": "whole_eligibility_criteria", "result": result}]
 
         elif classification_mode == "individual":
-            # Evaluate each criterion individually
-            results = []
-            for criterion in criteria_list:
-                result = self.match_criterion(patient_profile, criterion)
-                results.append({"criterion": criterion, "result": result})
-            return results
+            if early_stop_threshold is not None:
+                return self._match_criteria_until(
+                    patient_profile, criteria_list, early_stop_threshold
+                )
+
+            # Evaluate each criterion individually, several per LLM request
+            return self.match_criteria_batch(patient_profile, criteria_list)
 
         else:
             raise ValueError("classification_mode must be 'individual' or 'whole'")
+
+    def _match_criteria_until(self, patient_profile, criteria_list, threshold):
+        """
+        Evaluate criteria in small steps until the threshold is out of reach.
+
+        Args:
+            patient_profile (str): Patient profile text
+            criteria_list (list): List of clinical trial criteria
+            threshold (float): Minimum share of eligible criteria worth pursuing
+
+        Returns:
+            list: Matching results for the criteria evaluated so far
+        """
+        total = len(criteria_list)
+        results = []
+        eligible_count = 0
+        for start in range(0, total, self.early_stop_batch_size):
+            batch = criteria_list[start : start + self.early_stop_batch_size]
+            for match in self.match_criteria_batch(patient_profile, batch):
+                if match["result"]["classification"] == "eligible":
+                    eligible_count += 1
+                results.append(match)
+
+            # Best case: every remaining criterion turns out eligible
+            remaining = total - len(results)
+            if remaining and (eligible_count + remaining) / total < threshold:
+                logger.info(
+                    f"Stopping early after {len(results)}/{total} criteria "
+                    f"(threshold {threshold:.0%} unreachable)"
+                )
+                break
+
+        return results
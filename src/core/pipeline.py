@@ -7,8 +7,12 @@ and criterion matching components to provide a complete trial matching solution.
 
 import logging
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
 
 from src.core.criterion_matching.matcher import CriteriaMatcher
 from src.core.target_identification.search import ClinicalTrialSearcher
@@ -19,10 +23,24 @@ from src.models.schemas import (
     TrialMatchResult,
 )
 from src.utils import aact_utils
+from src.utils.result_writer import ResultsWriter
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_criterion(criterion: str) -> str:
+    """
+    Normalize a criterion for deduplication.
+
+    Args:
+        criterion: Criterion text
+
+    Returns:
+        Lowercased criterion with whitespace runs collapsed to single spaces
+    """
+    return " ".join(criterion.lower().split())
+
+
 @dataclass
 class PipelineConfig:
     """Configuration for the trial matching pipeline."""
@@ -33,29 +51,51 @@ class PipelineConfig:
     include_reasoning: bool = True
     search_size: int = 20
     classification_mode: str = "individual"  # "individual" or "whole"
+    max_workers: int = 8  # Threads used for blocking per-trial I/O
+    # Stop evaluating a trial once its match score cannot reach this value
+    early_stop_threshold: Optional[float] = None
 
 
 class TrialMatchingPipeline:
     """Main orchestrator for the trial matching pipeline."""
 
-    def __init__(self, config: Optional[PipelineConfig] = None):
-        """Initialize the pipeline with configuration."""
+    def __init__(
+        self,
+        config: Optional[PipelineConfig] = None,
+        searcher: Optional[ClinicalTrialSearcher] = None,
+        matcher: Optional[CriteriaMatcher] = None,
+    ):
+        """
+        Initialize the pipeline with configuration.
+
+        Args:
+            config: Pipeline configuration
+            searcher: Shared searcher to reuse (a new one is created if omitted)
+            matcher: Shared criteria matcher to reuse (a new one is created if omitted)
+        """
         self.config = config or PipelineConfig()
-        self.searcher = ClinicalTrialSearcher()
-        self.matcher = CriteriaMatcher()
+        self.searcher = searcher or ClinicalTrialSearcher()
+        self.matcher = matcher or CriteriaMatcher()
         self.logger = logging.getLogger(__name__)
 
-    def run_pipeline(self, patient_profile: str) -> MatchingResponse:
+    def run_pipeline(
+        self,
+        patient_profile: str,
+        on_result: Optional[Callable[[TrialMatchResult], None]] = None,
+    ) -> MatchingResponse:
         """
         Execute the complete trial matching pipeline.
 
         Args:
             patient_profile: Patient profile text
+            on_result: Optional callback invoked with each trial result as soon
+                as it is matched, e.g. to render results incrementally
 
         Returns:
             MatchingResponse with complete results
         """
-        start_time = time.time()
+        start_time = time.monotonic()
+        request_id = f"req_{int(time.time())}"
 
         try:
             self.logger.info("Starting trial matching pipeline")
@@ -69,24 +109,24 @@ class TrialMatchingPipeline:
             if not search_results["trials"]:
                 self.logger.warning("No trials found matching the patient profile")
                 return self._create_empty_response(
-                    patient_profile, time.time() - start_time
+                    request_id, patient_profile, time.monotonic() - start_time
                 )
 
             # Step 2: Criterion Matching - Evaluate patient against trial criteria
             self.logger.info("Step 2: Criterion Matching - Evaluating trial criteria")
             matching_results = self._match_criteria(
-                patient_profile, search_results["trials"]
+                patient_profile, search_results["trials"], on_result=on_result
             )
 
             # Step 3: Compile final results
             self.logger.info("Step 3: Compiling final results")
             final_results = self._compile_results(search_results, matching_results)
 
-            processing_time = time.time() - start_time
+            processing_time = time.monotonic() - start_time
             self.logger.info(f"Pipeline completed in {processing_time:.2f} seconds")
 
             return MatchingResponse(
-                request_id=f"req_{int(time.time())}",
+                request_id=request_id,
                 patient_profile=PatientProfile(
                     patient_id="patient_1", medical_history=patient_profile
                 ),
@@ -130,7 +170,10 @@ class TrialMatchingPipeline:
         }
 
     def _match_criteria(
-        self, patient_profile: str, trial_ids: List[str]
+        self,
+        patient_profile: str,
+        trial_ids: List[str],
+        on_result: Optional[Callable[[TrialMatchResult], None]] = None,
     ) -> List[TrialMatchResult]:
         """
         Match patient against trial criteria.
@@ -138,117 +181,229 @@ class TrialMatchingPipeline:
         Args:
             patient_profile: Patient profile text
             trial_ids: List of trial NCT IDs
+            on_result: Optional callback invoked with each trial result as soon
+                as it is available
 
         Returns:
             List of trial matching results
         """
         results = []
+        for trial_result in self._iter_match_criteria(patient_profile, trial_ids):
+            if on_result is not None:
+                on_result(trial_result)
+            results.append(trial_result)
+        return results
 
-        for i, nct_id in enumerate(trial_ids):
-            self.logger.info(f"Processing trial {i + 1}/{len(trial_ids)}: {nct_id}")
-
-            # Get criteria for this trial
-            criteria = aact_utils.get_criteria_by_nct_id(nct_id)
-            criteria_list = aact_utils.parse_clinical_trial_criteria(criteria)
+    def _iter_match_criteria(
+        self, patient_profile: str, trial_ids: List[str]
+    ) -> Iterator[TrialMatchResult]:
+        """
+        Match patient against trial criteria, yielding one trial at a time.
 
-            # Limit criteria per trial
-            if len(criteria_list) > self.config.max_criteria_per_trial:
-                criteria_list = criteria_list[: self.config.max_criteria_per_trial]
+        In individual mode the distinct criteria of all trials are evaluated
+        through batched LLM requests in trial order, and each trial is yielded
+        as soon as all of its criteria have a verdict.
 
-            # Match patient against criteria using specified mode
-            matching_results = self.matcher.match_all_criteria(
-                patient_profile,
-                criteria_list,
-                classification_mode=self.config.classification_mode,
-            )
+        Args:
+            patient_profile: Patient profile text
+            trial_ids: List of trial NCT IDs
 
-            if self.config.classification_mode == "whole":
-                # Handle whole criteria classification
-                if matching_results and len(matching_results) > 0:
-                    whole_result = matching_results[0]["result"]
-
-                    # Create criteria match for whole criteria
-                    criteria_matches = [
-                        CriteriaMatch(
-                            criteria_id=f"{nct_id}_whole",
-                            criteria_text="Complete eligibility criteria",
-                            criteria_type="whole",
-                            classification=whole_result["classification"],
-                            confidence=whole_result.get("overall_score", 0.8),
-                            reasoning=whole_result["explanation"]
-                            if self.config.include_reasoning
-                            else "",
-                            extracted_info={
-                                "overall_score": whole_result.get("overall_score", 0.0),
-                                "eligible_criteria_count": whole_result.get(
-                                    "eligible_criteria_count", 0
-                                ),
-                                "total_criteria_count": whole_result.get(
-                                    "total_criteria_count", 0
-                                ),
-                                "key_factors": whole_result.get("key_factors", []),
-                                "missing_information": whole_result.get(
-                                    "missing_information", []
-                                ),
-                            },
-                        )
-                    ]
-
-                    # Calculate match score from overall score
-                    match_score = whole_result.get("overall_score", 0.0)
-                    eligible_count = whole_result.get("eligible_criteria_count", 0)
-                    total_criteria = whole_result.get("total_criteria_count", 0)
-
-                else:
-                    # Fallback if no results
-                    criteria_matches = []
-                    match_score = 0.0
-                    eligible_count = 0
-                    total_criteria = 0
-
-            else:
-                # Handle individual criteria classification
-                criteria_matches = []
-                for match in matching_results:
-                    criteria_matches.append(
-                        CriteriaMatch(
-                            criteria_id=f"{nct_id}_{len(criteria_matches)}",
-                            criteria_text=match["criterion"],
-                            criteria_type="inclusion"
-                            if "inclusion" in match["criterion"].lower()
-                            else "exclusion",
-                            classification=match["result"]["classification"],
-                            confidence=0.8,  # Default confidence
-                            reasoning=match["result"]["explanation"]
-                            if self.config.include_reasoning
-                            else "",
-                            extracted_info={},
-                        )
-                    )
+        Yields:
+            Trial matching results in ``trial_ids`` order
+        """
+        # One cache lookup for all trials; misses are fetched in a single query
+        self.logger.info(f"Fetching criteria for {len(trial_ids)} trials")
+        parsed_criteria = aact_utils.get_parsed_criteria_by_nct_ids(trial_ids)
+        criteria_by_trial = {
+            nct_id: parsed_criteria.get(nct_id, [])[
+                : self.config.max_criteria_per_trial
+            ]
+            for nct_id in trial_ids
+        }
 
-                # Calculate overall trial match score
-                eligible_count = sum(
-                    1
-                    for match in criteria_matches
-                    if match.classification == "eligible"
+        if self.config.classification_mode == "whole":
+            # One LLM call per trial; run them concurrently, yield in order
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(self.config.max_workers, len(trial_ids)))
+            ) as executor:
+                whole_results = executor.map(
+                    lambda criteria_list: self.matcher.match_all_criteria(
+                        patient_profile, criteria_list, classification_mode="whole"
+                    ),
+                    criteria_by_trial.values(),
                 )
-                total_criteria = len(criteria_matches)
-                match_score = (
-                    eligible_count / total_criteria if total_criteria > 0 else 0
+                for nct_id, matching_results in zip(criteria_by_trial, whole_results):
+                    yield self._build_whole_result(nct_id, matching_results)
+            return
+
+        if self.config.classification_mode != "individual":
+            raise ValueError("classification_mode must be 'individual' or 'whole'")
+
+        if self.config.early_stop_threshold is not None:
+            # Each trial is evaluated in steps so hopeless trials stop early
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(self.config.max_workers, len(trial_ids)))
+            ) as executor:
+                partial_results = executor.map(
+                    lambda criteria_list: self.matcher.match_all_criteria(
+                        patient_profile,
+                        criteria_list,
+                        classification_mode="individual",
+                        early_stop_threshold=self.config.early_stop_threshold,
+                    ),
+                    criteria_by_trial.values(),
                 )
+                for (nct_id, criteria_list), matching_results in zip(
+                    criteria_by_trial.items(), partial_results
+                ):
+                    yield self._build_individual_result(
+                        nct_id, matching_results, total_criteria=len(criteria_list)
+                    )
+            return
 
-            # Create trial match result
-            trial_result = TrialMatchResult(
+        # Evaluate each distinct criterion once, then fan verdicts back out.
+        # Criteria differing only in case or spacing share one evaluation.
+        keys_by_trial = {
+            nct_id: [normalize_criterion(criterion) for criterion in criteria_list]
+            for nct_id, criteria_list in criteria_by_trial.items()
+        }
+        unique_criteria = {}
+        for nct_id, criteria_list in criteria_by_trial.items():
+            for key, criterion in zip(keys_by_trial[nct_id], criteria_list):
+                unique_criteria.setdefault(key, criterion)
+        self.logger.info(
+            f"Matching {len(unique_criteria)} unique criteria "
+            f"across {len(trial_ids)} trials"
+        )
+
+        pending_trials = deque(criteria_by_trial.items())
+        verdicts = {}
+        batches = self.matcher.iter_criteria_batches(
+            patient_profile, list(unique_criteria.values())
+        )
+        while pending_trials:
+            nct_id, criteria_list = pending_trials[0]
+            keys = keys_by_trial[nct_id]
+            if all(key in verdicts for key in keys):
+                pending_trials.popleft()
+                matching_results = [
+                    {"criterion": criterion, "result": verdicts[key]}
+                    for criterion, key in zip(criteria_list, keys)
+                ]
+                yield self._build_individual_result(nct_id, matching_results)
+                continue
+
+            for match in next(batches):
+                verdicts[normalize_criterion(match["criterion"])] = match["result"]
+
+    def _build_whole_result(
+        self, nct_id: str, matching_results: List[Dict[str, Any]]
+    ) -> TrialMatchResult:
+        """
+        Build a trial result from a whole-criteria evaluation.
+
+        Args:
+            nct_id: Trial NCT ID
+            matching_results: Output of ``match_all_criteria`` in whole mode
+
+        Returns:
+            Trial matching result
+        """
+        if not matching_results:
+            return TrialMatchResult(
                 trial_id=nct_id,
-                match_score=match_score,
-                eligible_criteria=eligible_count,
-                total_criteria=total_criteria,
-                criteria_matches=criteria_matches,
+                match_score=0.0,
+                eligible_criteria=0,
+                total_criteria=0,
+                criteria_matches=[],
             )
 
-            results.append(trial_result)
+        whole_result = matching_results[0]["result"]
+
+        # Create criteria match for whole criteria
+        criteria_matches = [
+            CriteriaMatch(
+                criteria_id=f"{nct_id}_whole",
+                criteria_text="Complete eligibility criteria",
+                criteria_type="whole",
+                classification=whole_result["classification"],
+                confidence=whole_result.get("overall_score", 0.8),
+                reasoning=(
+                    whole_result["explanation"] if self.config.include_reasoning else ""
+                ),
+                extracted_info={
+                    "overall_score": whole_result.get("overall_score", 0.0),
+                    "eligible_criteria_count": whole_result.get(
+                        "eligible_criteria_count", 0
+                    ),
+                    "total_criteria_count": whole_result.get("total_criteria_count", 0),
+                    "key_factors": whole_result.get("key_factors", []),
+                    "missing_information": whole_result.get("missing_information", []),
+                },
+            )
+        ]
 
-        return results
+        # Calculate match score from overall score
+        return TrialMatchResult(
+            trial_id=nct_id,
+            match_score=whole_result.get("overall_score", 0.0),
+            eligible_criteria=whole_result.get("eligible_criteria_count", 0),
+            total_criteria=whole_result.get("total_criteria_count", 0),
+            criteria_matches=criteria_matches,
+        )
+
+    def _build_individual_result(
+        self,
+        nct_id: str,
+        matching_results: List[Dict[str, Any]],
+        total_criteria: Optional[int] = None,
+    ) -> TrialMatchResult:
+        """
+        Build a trial result from per-criterion evaluations.
+
+        Args:
+            nct_id: Trial NCT ID
+            matching_results: Per-criterion matching results for this trial
+            total_criteria: Number of criteria of the trial, when evaluation
+                stopped before all of them were matched
+
+        Returns:
+            Trial matching result
+        """
+        criteria_matches = []
+        eligible_count = 0
+        for match in matching_results:
+            if match["result"]["classification"] == "eligible":
+                eligible_count += 1
+            criteria_matches.append(
+                CriteriaMatch(
+                    criteria_id=f"{nct_id}_{len(criteria_matches)}",
+                    criteria_text=match["criterion"],
+                    criteria_type=aact_utils.get_criteria_type(match["criterion"]),
+                    classification=match["result"]["classification"],
+                    confidence=0.8,  # Default confidence
+                    reasoning=(
+                        match["result"]["explanation"]
+                        if self.config.include_reasoning
+                        else ""
+                    ),
+                    extracted_info={},
+                )
+            )
+
+        # Calculate overall trial match score
+        if total_criteria is None:
+            total_criteria = len(criteria_matches)
+        match_score = eligible_count / total_criteria if total_criteria > 0 else 0
+
+        return TrialMatchResult(
+            trial_id=nct_id,
+            match_score=match_score,
+            eligible_criteria=eligible_count,
+            total_criteria=total_criteria,
+            criteria_matches=criteria_matches,
+            truncated=len(criteria_matches) < total_criteria,
+        )
 
     def _compile_results(
         self, search_results: Dict[str, Any], matching_results: List[TrialMatchResult]
@@ -261,25 +416,31 @@ class TrialMatchingPipeline:
             matching_results: Results from criteria matching
 
         Returns:
-            Compiled results with additional metadata
+            Compiled results with additional metadata, ranked by match score
+            (ties keep search relevance order)
         """
         # Add trial data to matching results
+        trials_by_id = {
+            trial_data["nct_id"]: trial_data
+            for trial_data in search_results["formatted_results"]
+        }
+        compiled_results = []
         for result in matching_results:
-            # Find corresponding trial data from search results
-            for trial_data in search_results["formatted_results"]:
-                if trial_data["nct_id"] == result.trial_id:
-                    # Add trial data to result
-                    result.trial_data = trial_data
-                    break
+            trial_data = trials_by_id.get(result.trial_id)
+            if trial_data is not None:
+                # Results are frozen, so attach trial data on a shallow copy
+                result = result.model_copy(update={"trial_data": trial_data})
+            compiled_results.append(result)
 
-        return matching_results
+        # Rank once here so consumers can rely on the order
+        return sorted(compiled_results, key=lambda r: r.match_score, reverse=True)
 
     def _create_summary(self, results: List[TrialMatchResult]) -> Dict[str, Any]:
         """
         Create summary statistics from results.
 
         Args:
-            results: List of trial matching results
+            results: Trial matching results ranked by match score
 
         Returns:
             Summary statistics dictionary
@@ -292,25 +453,25 @@ class TrialMatchingPipeline:
                 "best_match_score": 0.0,
             }
 
-        total_trials = len(results)
-        trials_with_matches = sum(1 for r in results if r.match_score > 0)
-        average_score = sum(r.match_score for r in results) / total_trials
-        best_score = max(r.match_score for r in results)
+        scores = np.fromiter(
+            (r.match_score for r in results), dtype=np.float64, count=len(results)
+        )
 
         return {
-            "total_trials": total_trials,
-            "trials_with_matches": trials_with_matches,
-            "average_match_score": average_score,
-            "best_match_score": best_score,
+            "total_trials": len(results),
+            "trials_with_matches": int(np.count_nonzero(scores > 0)),
+            "average_match_score": float(scores.mean()),
+            "best_match_score": float(scores[0]),
         }
 
     def _create_empty_response(
-        self, patient_profile: str, processing_time: float
+        self, request_id: str, patient_profile: str, processing_time: float
     ) -> MatchingResponse:
         """
         Create empty response when no trials are found.
 
         Args:
+            request_id: Request identifier
             patient_profile: Patient profile text
             processing_time: Processing time
 
@@ -318,7 +479,7 @@ class TrialMatchingPipeline:
             Empty matching response
         """
         return MatchingResponse(
-            request_id=f"req_{int(time.time())}",
+            request_id=request_id,
             patient_profile=PatientProfile(
                 patient_id="patient_1", medical_history=patient_profile
             ),
@@ -335,6 +496,10 @@ def run_trial_matching_pipeline(
     skip_masking: bool = False,
     include_reasoning: bool = True,
     classification_mode: str = "individual",
+    searcher: Optional[ClinicalTrialSearcher] = None,
+    matcher: Optional[CriteriaMatcher] = None,
+    on_result: Optional[Callable[[TrialMatchResult], None]] = None,
+    early_stop_threshold: Optional[float] = None,
 ) -> MatchingResponse:
     """
     Convenience function to run the trial matching pipeline.
@@ -346,6 +511,11 @@ def run_trial_matching_pipeline(
         skip_masking: Whether to skip patient data masking
         include_reasoning: Whether to include reasoning in results
         classification_mode: "individual" for per-criterion or "whole" for entire criteria
+        searcher: Optional shared ClinicalTrialSearcher (e.g. cached by the app)
+        matcher: Optional shared CriteriaMatcher (e.g. cached by the app)
+        on_result: Optional callback invoked with each trial result as it completes
+        early_stop_threshold: Stop evaluating a trial once its match score can
+            no longer reach this value (individual mode only; None disables)
 
     Returns:
         MatchingResponse with complete results
@@ -356,17 +526,20 @@ def run_trial_matching_pipeline(
         skip_masking=skip_masking,
         include_reasoning=include_reasoning,
         classification_mode=classification_mode,
+        early_stop_threshold=early_stop_threshold,
     )
 
-    pipeline = TrialMatchingPipeline(config)
-    return pipeline.run_pipeline(patient_profile)
+    pipeline = TrialMatchingPipeline(config, searcher=searcher, matcher=matcher)
+    return pipeline.run_pipeline(patient_profile, on_result=on_result)
 
 
 if __name__ == "__main__":
-    run_trial_matching_pipeline(
-        patient_profile="data/patient_data/patient.1.1.txt",
-        max_trials=2,
-        max_criteria_per_trial=2,
-        skip_masking=True,
-        include_reasoning=True,
-    )
+    with ResultsWriter("results/trial_matching_results.json") as writer:
+        run_trial_matching_pipeline(
+            patient_profile="data/patient_data/patient.1.1.txt",
+            max_trials=2,
+            max_criteria_per_trial=2,
+            skip_masking=True,
+            include_reasoning=True,
+            on_result=writer.write,
+        )
@@ -1,11 +1,19 @@
+import json
 import logging
+import queue
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
 
 import psycopg2
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
 
 from src.settings import settings
+from src.utils.es_utils import FastJSONSerializer
 
 # Set up logging
 logging.basicConfig(
@@ -22,10 +30,34 @@ pg_conn_params = {
     "password": settings.sql_password,
 }
 
-# Elasticsearch connection
-es = Elasticsearch([settings.elasticsearch_url])
+# Bulk indexing parallelism
+BULK_THREAD_COUNT = 4
+BULK_CHUNK_SIZE = 1000
+
+# Elasticsearch connection; the pool holds one connection per bulk thread
+# plus headroom, and bulk bodies are gzipped
+es = Elasticsearch(
+    [settings.elasticsearch_url],
+    maxsize=BULK_THREAD_COUNT * 4,
+    http_compress=True,
+    timeout=60,
+    retry_on_timeout=True,
+    max_retries=3,
+    serializer=FastJSONSerializer(),
+)
 index_name = settings.es_index_name
 
+# Array-valued columns; NULLs are indexed as empty lists
+ARRAY_FIELDS = frozenset(
+    [
+        "conditions",
+        "interventions",
+        "keywords",
+        "mesh_terms_conditions",
+        "mesh_terms_interventions",
+    ]
+)
+
 # Elasticsearch index mapping
 mapping = {
     "mappings": {
@@ -56,29 +88,146 @@ mapping = {
 
 
 def create_index():
-    """Create Elasticsearch index with mappings if it doesn't exist."""
+    """
+    Create Elasticsearch index with mappings if it doesn't exist.
+
+    Returns True when a new, empty index was created.
+    """
     if not es.indices.exists(index=index_name):
         es.indices.create(index=index_name, body=mapping)
         logger.info(f"Created index {index_name}")
-    else:
-        logger.info(f"Index {index_name} already exists")
+        return True
+    logger.info(f"Index {index_name} already exists")
+    return False
 
 
-def get_total_trials():
-    """Get the total number of trials in the studies table."""
+def get_connection():
+    """Open a PostgreSQL connection for read-only ingestion queries."""
     conn = psycopg2.connect(**pg_conn_params, connect_timeout=300)  # type: ignore
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM ctgov.studies")
-    total = cursor.fetchone()[0]
-    cursor.close()
-    conn.close()
-    return total
+    # Avoid holding one transaction open for the whole ingestion run
+    conn.autocommit = True
+    return conn
+
+
+# Each side table is aggregated per study in a LATERAL subquery, so the
+# joins never multiply into a cross product that has to be de-duplicated
+FETCH_TRIALS_QUERY = """
+SELECT 
+    s.nct_id,
+    s.brief_title as title,
+    s.official_title,
+    bs.description AS brief_summary,
+    c.conditions,
+    k.keywords,
+    bc.mesh_terms_conditions,
+    i.interventions,
+    bi.mesh_terms_interventions
+
+FROM 
+    ctgov.studies s
+LEFT JOIN 
+    ctgov.brief_summaries bs ON s.nct_id = bs.nct_id
+LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT name) AS conditions
+    FROM ctgov.conditions WHERE nct_id = s.nct_id
+) c ON true
+LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT name) AS interventions
+    FROM ctgov.interventions WHERE nct_id = s.nct_id
+) i ON true
+LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT name) AS keywords
+    FROM ctgov.keywords WHERE nct_id = s.nct_id
+) k ON true
+LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT mesh_term) AS mesh_terms_conditions
+    FROM ctgov.browse_conditions WHERE nct_id = s.nct_id
+) bc ON true
+LEFT JOIN LATERAL (
+    SELECT array_agg(DISTINCT mesh_term) AS mesh_terms_interventions
+    FROM ctgov.browse_interventions WHERE nct_id = s.nct_id
+) bi ON true
+WHERE 
+    {where}
+ORDER BY 
+    s.nct_id
+LIMIT $2
+"""
+
+# Full and incremental runs are prepared separately, so the generic plan of
+# an incremental run can still use an index on last_update_submitted_date
+FETCH_TRIALS_FULL = "PREPARE fetch_trials_full (text, integer) AS" + (
+    FETCH_TRIALS_QUERY.format(where="s.nct_id > $1")
+)
+FETCH_TRIALS_SINCE = "PREPARE fetch_trials_since (text, integer, date) AS" + (
+    FETCH_TRIALS_QUERY.format(
+        where="s.nct_id > $1 AND s.last_update_submitted_date >= $3"
+    )
+)
 
+# Connections on which the fetch_trials statements have been prepared
+_prepared_connections = weakref.WeakSet()
 
-def fetch_batch(last_nct_id=None, limit=500):
-    """Fetch a batch of trials from PostgreSQL using keyset pagination."""
-    conn = psycopg2.connect(**pg_conn_params, connect_timeout=300)  # type: ignore
-    cursor = conn.cursor()
+
+@contextmanager
+def _use_connection(conn=None):
+    """Yield ``conn``, or a temporary connection that is closed afterwards."""
+    if conn is not None:
+        yield conn
+        return
+
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def load_last_sync():
+    """Return the update date synced by the last complete run, or None."""
+    state_path = Path(settings.es_sync_state_path)
+    if not state_path.exists():
+        return None
+    with open(state_path, "r") as f:
+        return json.load(f).get("last_update_submitted_date")
+
+
+def save_last_sync(last_update_date):
+    """Record the update date covered by a complete run."""
+    state_path = Path(settings.es_sync_state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(state_path, "w") as f:
+        json.dump({"last_update_submitted_date": last_update_date}, f)
+
+
+def get_last_update_date(conn=None):
+    """Get the most recent update date in the studies table as an ISO string."""
+    with _use_connection(conn) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(last_update_submitted_date) FROM ctgov.studies")
+        last_update_date = cursor.fetchone()[0]
+    return last_update_date.isoformat() if last_update_date else None
+
+
+def get_total_trials(conn=None, since=None):
+    """Get the number of trials updated on or after ``since`` (all when None)."""
+    query = "SELECT COUNT(*) FROM ctgov.studies"
+    params = ()
+    if since:
+        query += " WHERE last_update_submitted_date >= %s"
+        params = (since,)
+    with _use_connection(conn) as conn, conn.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+
+def fetch_batch(last_nct_id=None, limit=500, conn=None, since=None):
+    """
+    Fetch a batch of trials from PostgreSQL using keyset pagination.
+
+    When ``since`` is given only trials updated on or after that date are
+    fetched, so incremental runs skip unchanged trials. The queries are
+    prepared once per connection, so later batches skip parsing and planning.
+    """
     # query = """
     # SELECT
     #     s.nct_id,
@@ -130,49 +279,23 @@ def fetch_batch(last_nct_id=None, limit=500):
     # LIMIT %s;
     # """
 
-    query = """
-    SELECT 
-        s.nct_id,
-        s.brief_title as title,
-        s.official_title,
-        bs.description AS brief_summary,
-        array_agg(DISTINCT c.name) AS conditions,
-        array_agg(DISTINCT k.name) AS keywords,
-        array_agg(DISTINCT bc.mesh_term) AS mesh_terms_conditions,
-        array_agg(DISTINCT i.name) AS interventions,
-        array_agg(DISTINCT bi.mesh_term) AS mesh_terms_interventions
-
-    FROM 
-        ctgov.studies s
-    LEFT JOIN 
-        ctgov.conditions c ON s.nct_id = c.nct_id
-    LEFT JOIN 
-        ctgov.interventions i ON s.nct_id = i.nct_id
-    LEFT JOIN 
-        ctgov.keywords k ON s.nct_id = k.nct_id
-    LEFT JOIN 
-        ctgov.browse_conditions bc ON s.nct_id = bc.nct_id
-    LEFT JOIN 
-        ctgov.browse_interventions bi ON s.nct_id = bi.nct_id
-    LEFT JOIN 
-        ctgov.brief_summaries bs ON s.nct_id = bs.nct_id
-    LEFT JOIN 
-        ctgov.result_contacts AS r ON s.nct_id = r.nct_id
-    WHERE 
-        s.nct_id > %s
-    GROUP BY 
-        s.nct_id, s.brief_title, s.official_title, bs.description
-    ORDER BY 
-        s.nct_id
-    LIMIT %s;
-    """
-
-    # Use an empty string or a very low value for the first batch
-    cursor.execute(query, (last_nct_id or "", limit))
-    rows = cursor.fetchall()
-    column_names = [desc[0] for desc in cursor.description]
-    cursor.close()
-    conn.close()
+    with _use_connection(conn) as conn, conn.cursor() as cursor:
+        if conn not in _prepared_connections:
+            cursor.execute(FETCH_TRIALS_FULL)
+            cursor.execute(FETCH_TRIALS_SINCE)
+            _prepared_connections.add(conn)
+        # Use an empty string or a very low value for the first batch
+        if since:
+            cursor.execute(
+                "EXECUTE fetch_trials_since (%s, %s, %s)",
+                (last_nct_id or "", limit, since),
+            )
+        else:
+            cursor.execute(
+                "EXECUTE fetch_trials_full (%s, %s)", (last_nct_id or "", limit)
+            )
+        rows = cursor.fetchall()
+        column_names = [desc[0] for desc in cursor.description]
 
     # Return the rows, column names, and the last nct_id for the next batch
     next_nct_id = rows[-1][0] if rows else None
@@ -181,51 +304,45 @@ def fetch_batch(last_nct_id=None, limit=500):
 
 def transform_to_documents(rows, column_names):
     """Transform PostgreSQL rows into JSON documents."""
+    # Handle NULL values for array fields, looked up once per batch
+    array_fields = [name for name in column_names if name in ARRAY_FIELDS]
     documents = []
     for row in rows:
-        doc = {column_names[i]: row[i] for i in range(len(column_names))}
-        # Handle NULL values for array fields
-        for field in [
-            "conditions",
-            "interventions",
-            "keywords",
-            "mesh_terms_conditions",
-            "mesh_terms_interventions",
-            # "sites",
-            # "intervention_name",
-            # "condition_name",
-        ]:
+        doc = dict(zip(column_names, row))
+        for field in array_fields:
             if doc[field] is None:
                 doc[field] = []
-            # Convert string-aggregated fields to lists
-            # elif field in ["sites", "intervention_name", "condition_name"]:
-            #     doc[field] = doc[field].split("\n") if doc[field] else []
-
-        # # Ensure contact field exists and handle NULL
-        # if "contact" in doc and doc["contact"] is None:
-        #     doc["contact"] = ""
-
-        # # Ensure eligibility_criteria exists and handle NULL
-        # if "eligibility_criteria" in doc and doc["eligibility_criteria"] is None:
-        #     doc["eligibility_criteria"] = ""
-
         documents.append(doc)
     return documents
 
 
-def index_batch(documents):
-    """Bulk index a batch of documents to Elasticsearch."""
-    actions = [
-        {
+def iter_actions(documents):
+    """Yield bulk index actions for documents without building a list."""
+    for doc in documents:
+        yield {
             "_op_type": "index",
             "_index": index_name,
             "_id": doc["nct_id"],
             "_source": doc,
         }
-        for doc in documents
-    ]
+
+
+def index_batch(documents):
+    """Bulk index a batch of documents to Elasticsearch."""
+    actions = iter_actions(documents)
     try:
-        success, failed = bulk(es, actions, raise_on_error=False)
+        success, failed = 0, []
+        for ok, info in parallel_bulk(
+            es,
+            actions,
+            thread_count=BULK_THREAD_COUNT,
+            chunk_size=BULK_CHUNK_SIZE,
+            raise_on_error=False,
+        ):
+            if ok:
+                success += 1
+            else:
+                failed.append(info)
         logger.info(f"Successfully indexed {success} documents")
         if failed:
             logger.error(f"Failed to index {len(failed)} documents: {failed}")  # type: ignore
@@ -236,39 +353,101 @@ def index_batch(documents):
 
 
 def main():
-    # Create index
-    create_index()
+    # Create index; a new index is empty, so it needs a full run whatever
+    # the sync state says
+    created = create_index()
+
+    # One connection is reused for every query of the run
+    conn = get_connection()
+
+    try:
+        # Only trials updated since the last complete run are re-indexed;
+        # delete the state file to force a full run
+        since = None if created else load_last_sync()
+        last_update_date = get_last_update_date(conn)
+        logger.info(f"Indexing trials updated since {since or 'the beginning'}")
+        failed_count = process_trials(conn, since)
+    finally:
+        conn.close()
+
+    # The mark only advances once every document is indexed, so a failed run
+    # is retried from the same date
+    if failed_count:
+        logger.warning(
+            f"{failed_count} documents failed; keeping sync date {since or 'unset'}"
+        )
+    elif last_update_date:
+        save_last_sync(last_update_date)
+    logger.info("Indexing complete")
+
 
+def produce_batches(conn, batch_size, batches, stop, since=None):
+    """Fetch and transform batches of trials, putting them on ``batches``."""
+    last_nct_id = ""
+    try:
+        while not stop.is_set():
+            logger.info(f"Fetching batch at last_nct_id {last_nct_id}")
+            rows, column_names, next_nct_id = fetch_batch(
+                last_nct_id, batch_size, conn, since
+            )
+            if not rows:
+                logger.info("No more data to fetch")
+                break
+
+            documents = transform_to_documents(rows, column_names)
+            logger.info(f"Transformed {len(documents)} documents")
+            batches.put(documents)
+
+            last_nct_id = next_nct_id
+    finally:
+        # Tell the consumer no more batches are coming
+        batches.put(None)
+
+
+def process_trials(conn, since=None):
+    """
+    Copy trials updated since ``since`` (all when None) to Elasticsearch in batches.
+
+    Returns the number of documents that failed to index.
+    """
     # Get total number of trials
-    total_trials = get_total_trials()
+    total_trials = get_total_trials(conn, since)
     logger.info(f"Total trials to process: {total_trials}")
 
-    # Process in batches
-    last_nct_id = ""
+    # Process in batches; the next batch is fetched while this one is indexed
     batch_size = 50000
     count = 0
+    failed_count = 0
     time_start = time.time()
-    while True:
-        logger.info(f"Fetching batch at last_nct_id {last_nct_id}")
-        rows, column_names, next_nct_id = fetch_batch(last_nct_id, batch_size)
-        if not rows:
-            logger.info("No more data to fetch")
-            break
-
-        documents = transform_to_documents(rows, column_names)
-        logger.info(f"Transformed {len(documents)} documents")
-
-        success, failed = index_batch(documents)
-        logger.info(f"Indexed batch: {success} successful, {len(failed)} failed")  # type: ignore
-
-        last_nct_id = next_nct_id
-
-        count += len(documents)
-        logger.info(
-            f"Processed {count} trials in {((time.time() - time_start) / 3600):.2f} hours"
+    batches = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        producer = executor.submit(
+            produce_batches, conn, batch_size, batches, stop, since
         )
-
-    logger.info("Indexing complete")
+        try:
+            while (documents := batches.get()) is not None:
+                success, failed = index_batch(documents)
+                logger.info(f"Indexed batch: {success} successful, {len(failed)} failed")  # type: ignore
+                failed_count += len(failed)
+
+                count += len(documents)
+                logger.info(
+                    f"Processed {count} trials in {((time.time() - time_start) / 3600):.2f} hours"
+                )
+        finally:
+            # Unblock the producer if indexing stopped while the queue was full
+            stop.set()
+            while not producer.done():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+        # Re-raise any error from the producer
+        producer.result()
+
+    return failed_count
 
 
 if __name__ == "__main__":
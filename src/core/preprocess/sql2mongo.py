@@ -1,6 +1,9 @@
 import re
 from typing import Dict, List
 
+EXCLUSION_HEADER_PATTERN = re.compile(r"\bExclusion Criteria\b\s*:?", re.IGNORECASE)
+CRITERION_START_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+\.)\s*", re.MULTILINE)
+
 
 def extract_criteria(text: str) -> Dict[str, List[str]]:
     # Normalize bullets
@@ -8,7 +11,7 @@ def extract_criteria(text: str) -> Dict[str, List[str]]:
 
     # Split into inclusion and exclusion
     inclusion_text, exclusion_text = "", ""
-    match = re.split(r"\bExclusion Criteria\b\s*:?", text, flags=re.IGNORECASE)
+    match = EXCLUSION_HEADER_PATTERN.split(text)
     if len(match) == 2:
         inclusion_text = match[0]
         exclusion_text = match[1]
@@ -16,27 +19,10 @@ def extract_criteria(text: str) -> Dict[str, List[str]]:
         inclusion_text = text
 
     def parse_criteria(block: str) -> List[str]:
-        lines = block.strip().split("\n")
-        criteria = []
-        buffer = ""
-
-        for line in lines:
-            line = line.strip()
-
-            # Start of a new criterion
-            if re.match(r"^[-*•]|\d+\.", line):
-                if buffer:
-                    criteria.append(buffer.strip())
-                    buffer = ""
-                buffer = re.sub(r"^[-*•] ?|\d+\.\s*", "", line)
-            elif line:  # Continuation of previous line
-                if buffer:
-                    buffer += " " + line
-                else:
-                    buffer = line  # In case it starts directly without a bullet
-        if buffer:
-            criteria.append(buffer.strip())
-        return criteria
+        # Each bullet or numbered item starts a new criterion; the lines that
+        # follow it are continuations and are joined with single spaces
+        parts = CRITERION_START_PATTERN.split(block)
+        return [" ".join(part.split()) for part in parts if part.strip()]
 
     return {
         "inclusion_criteria": parse_criteria(inclusion_text),
@@ -1,14 +1,33 @@
-import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from src.utils.openai_utils import get_structured_llm_response
+from pydantic_core import from_json
+
+from src.settings import settings
+from src.utils.cache_utils import (
+    content_digest,
+    get_cached_json_many,
+    prompt_version,
+    set_cached_json_many,
+)
+from src.utils.openai_utils import (
+    JSON_OBJECT_RESPONSE_FORMAT,
+    get_structured_llm_response,
+)
 from src.utils.prompts import KEYWORD_ENRICHMENT_PROMPT, KEYWORD_ENRICHMENT_SYSTEM
 
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_CACHE_PREFIX = "enrichment:"
+
 
 class KeywordEnricher:
     def __init__(self):
         self.system_message = KEYWORD_ENRICHMENT_SYSTEM
         self.prompt_template = KEYWORD_ENRICHMENT_PROMPT
-        self.response_format = {"type": "json_object"}
+        self.response_format = JSON_OBJECT_RESPONSE_FORMAT
+        self.batch_size = settings.enrichment_batch_size
+        self._prompt_version = prompt_version(self.system_message, self.prompt_template)
 
     def enrich_keywords(self, keywords):
         """
@@ -20,25 +39,95 @@ class KeywordEnricher:
         Returns:
             dict: Enriched keywords with synonyms and related terms
         """
-        # Flatten keywords into a list
-        all_keywords = []
+        # Flatten keywords into a list, dropping case-insensitive duplicates
+        # that appear in more than one category
+        unique_keywords = {}
         for category in keywords.values():
             if isinstance(category, list):
-                all_keywords.extend(category)
+                for keyword in category:
+                    keyword = keyword.strip()
+                    if keyword:
+                        unique_keywords.setdefault(keyword.casefold(), keyword)
+        all_keywords = sorted(unique_keywords.values())
 
-        # Process all keywords in a single call
         if not all_keywords:
             return {}
 
+        # Enrichment is cached per keyword, so only keywords not seen before
+        # are sent to the LLM
+        enriched_terms = {}
+        missing = []
+        cached = get_cached_json_many([self._cache_key(k) for k in all_keywords])
+        for keyword, terms in zip(all_keywords, cached):
+            if terms is None:
+                missing.append(keyword)
+            else:
+                enriched_terms[keyword] = terms
+        if enriched_terms:
+            logger.info(
+                f"Keyword enrichment cache hits: {len(enriched_terms)}/{len(all_keywords)}"
+            )
+        if not missing:
+            return enriched_terms
+
+        # Enrich chunks of keywords concurrently; each response only has to
+        # cover its own chunk, so the calls finish sooner than one long call
+        chunks = [
+            missing[i : i + self.batch_size]
+            for i in range(0, len(missing), self.batch_size)
+        ]
+        if len(chunks) == 1:
+            enriched_terms.update(self._enrich_chunk(chunks[0]))
+            return enriched_terms
+
+        max_workers = min(len(chunks), settings.llm_max_concurrency)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk_terms in executor.map(self._enrich_chunk, chunks):
+                enriched_terms.update(chunk_terms)
+
+        return enriched_terms
+
+    def _cache_key(self, keyword):
+        """Build the cache key of one keyword's enrichment, ignoring case."""
+        return ENRICHMENT_CACHE_PREFIX + content_digest(
+            self._prompt_version, keyword.casefold()
+        )
+
+    def _enrich_chunk(self, keywords):
+        """
+        Enrich one chunk of keywords with a single LLM call.
+
+        Args:
+            keywords (list): Unique keywords, sorted
+
+        Returns:
+            dict: Enriched keywords with synonyms and related terms
+        """
         # Join all keywords with commas for the prompt
-        keywords_text = ", ".join(all_keywords)
-        prompt = self.prompt_template.format(keywords=keywords_text)
+        prompt = self.prompt_template.format(keywords=", ".join(keywords))
 
         response = get_structured_llm_response(
             prompt, self.system_message, self.response_format
         )
 
-        # Parse the response which should contain enrichment for all keywords
-        enriched_terms = json.loads(response)
+        # Parse the response which should contain enrichment for all keywords.
+        # The model may recase keys, so they are matched ignoring case and
+        # returned under the requested spelling; keys that were not requested
+        # are dropped, and keywords the LLM left out are not cached, so they
+        # are retried later
+        terms_by_key = {}
+        for key, terms in from_json(response).items():
+            terms_by_key.setdefault(key.casefold(), terms)
+        enriched_terms = {
+            keyword: terms_by_key[keyword.casefold()]
+            for keyword in keywords
+            if keyword.casefold() in terms_by_key
+        }
+        set_cached_json_many(
+            {
+                self._cache_key(keyword): terms
+                for keyword, terms in enriched_terms.items()
+            }
+        )
 
         return enriched_terms
@@ -1,14 +1,29 @@
-import json
-
-from src.utils.openai_utils import get_structured_llm_response
+import logging
+
+from src.models.schemas import ExtractedKeywords
+from src.utils.cache_utils import (
+    content_digest,
+    get_cached_json,
+    prompt_version,
+    set_cached_json,
+)
+from src.utils.openai_utils import (
+    get_structured_llm_response,
+    json_schema_response_format,
+)
 from src.utils.prompts import KEYWORD_EXTRACTION_PROMPT, KEYWORD_EXTRACTION_SYSTEM
 
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_PREFIX = "keywords:"
+
 
 class KeywordExtractor:
     def __init__(self):
         self.system_message = KEYWORD_EXTRACTION_SYSTEM
         self.prompt_template = KEYWORD_EXTRACTION_PROMPT
-        self.response_format = {"type": "json_object"}
+        self.response_format = json_schema_response_format(ExtractedKeywords)
+        self._prompt_version = prompt_version(self.system_message, self.prompt_template)
 
     def extract_keywords(self, masked_profile):
         """
@@ -20,11 +35,21 @@ class KeywordExtractor:
         Returns:
             dict: Extracted keywords in structured format
         """
+        cache_key = EXTRACTION_CACHE_PREFIX + content_digest(
+            self._prompt_version, masked_profile
+        )
+        keywords = get_cached_json(cache_key)
+        if keywords is not None:
+            logger.info("Keyword extraction cache hit")
+            return keywords
+
         prompt = self.prompt_template.format(masked_profile=masked_profile)
         response = get_structured_llm_response(
             prompt, self.system_message, self.response_format
         )
-        return json.loads(response)
+        keywords = ExtractedKeywords.model_validate_json(response).model_dump()
+        set_cached_json(cache_key, keywords)
+        return keywords
 
 
 if __name__ == "__main__":
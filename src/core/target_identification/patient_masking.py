@@ -1,11 +1,24 @@
+import logging
+
+from src.utils.cache_utils import (
+    content_digest,
+    get_cached_json,
+    prompt_version,
+    set_cached_json,
+)
 from src.utils.openai_utils import get_llm_response
 from src.utils.prompts import PATIENT_MASKING_PROMPT, PATIENT_MASKING_SYSTEM
 
+logger = logging.getLogger(__name__)
+
+MASK_CACHE_PREFIX = "mask:"
+
 
 class PatientMasker:
     def __init__(self):
         self.system_message = PATIENT_MASKING_SYSTEM
         self.prompt_template = PATIENT_MASKING_PROMPT
+        self._prompt_version = prompt_version(self.system_message, self.prompt_template)
 
     def mask_patient_data(self, patient_profile):
         """
@@ -17,8 +30,17 @@ class PatientMasker:
         Returns:
             str: Masked patient profile
         """
+        cache_key = MASK_CACHE_PREFIX + content_digest(
+            self._prompt_version, patient_profile
+        )
+        masked_profile = get_cached_json(cache_key)
+        if masked_profile is not None:
+            logger.info("Masking cache hit")
+            return masked_profile
+
         prompt = self.prompt_template.format(patient_profile=patient_profile)
         masked_profile = get_llm_response(prompt, self.system_message)
+        set_cached_json(cache_key, masked_profile)
         return masked_profile
 
 
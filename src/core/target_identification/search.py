@@ -1,12 +1,18 @@
+import json
 import logging
-from typing import Dict, List, Optional, Union
-
-from elasticsearch import Elasticsearch
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Optional, Tuple, Union
 
 from src.core.target_identification.keyword_enrichment import KeywordEnricher
 from src.core.target_identification.keyword_extraction import KeywordExtractor
 from src.core.target_identification.patient_masking import PatientMasker
 from src.settings import settings
+from src.utils.es_utils import get_es_client
 
 # Set up logging
 logging.basicConfig(
@@ -14,6 +20,92 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Searches per _msearch request
+MSEARCH_CHUNK_SIZE = 50
+
+# Log only every Nth search without usable keywords
+EMPTY_KEYWORDS_LOG_EVERY = 100
+
+# Trial fields returned by searches unless the caller asks for fewer
+SEARCH_SOURCE_FIELDS = (
+    "nct_id",
+    "brief_title",
+    "official_title",
+    "conditions",
+    "interventions",
+    "keywords",
+    "brief_summary",
+)
+
+
+@lru_cache(maxsize=4096)
+def build_query_from_terms(
+    primary_terms: Tuple[str, ...], secondary_terms: Tuple[str, ...]
+) -> Dict:
+    """
+    Build the Elasticsearch query for de-duplicated search terms.
+
+    Queries are memoized by their terms, so the returned dictionary is shared
+    between calls and must not be modified.
+
+    Args:
+        primary_terms: Keywords to match, most important fields boosted
+        secondary_terms: Enrichment terms added as an optional boost
+
+    Returns:
+        Elasticsearch query dictionary
+    """
+    # Build a much simpler query structure
+    # Focus on the most important fields with a multi_match query
+    query_terms = " ".join(primary_terms)
+
+    # Primary query: Multi-match on most important fields
+    primary_query = {
+        "multi_match": {
+            "query": query_terms,
+            "fields": [
+                "brief_title^3",
+                "official_title^2.5",
+                "conditions^2",
+                "interventions^2",
+                "keywords^1.5",
+            ],
+            "type": "best_fields",
+            "operator": "or",
+        }
+    }
+
+    # If we have secondary terms (enriched), add them as a boost
+    if secondary_terms:
+        secondary_query_terms = " ".join(secondary_terms)
+        secondary_query = {
+            "multi_match": {
+                "query": secondary_query_terms,
+                "fields": [
+                    "brief_title^1.5",
+                    "official_title^1.2",
+                    "conditions^1",
+                    "interventions^1",
+                    "keywords^0.8",
+                ],
+                "type": "best_fields",
+                "operator": "or",
+            }
+        }
+
+        # Combine primary and secondary queries
+        query = {
+            "bool": {
+                "must": [primary_query],
+                "should": [secondary_query],
+                "minimum_should_match": 0,
+            }
+        }
+    else:
+        query = primary_query
+
+    return query
+
 
 class ClinicalTrialSearcher:
     def __init__(self, es_url: Optional[str] = None, index_name: str = None):
@@ -28,8 +120,13 @@ class ClinicalTrialSearcher:
             es_url = settings.elasticsearch_url or "http://localhost:9200"
         if index_name is None:
             index_name = settings.es_index_name
-        self.es = Elasticsearch([es_url])
+        self.es = get_es_client(es_url)
         self.index_name = index_name
+        self._index_checked = False
+        self._empty_keywords_count = 0
+        # Recent ES responses keyed by the serialized search body
+        self._search_cache: OrderedDict = OrderedDict()
+        self._search_cache_lock = threading.Lock()
         self.keyword_extractor = KeywordExtractor()
         self.keyword_enricher = KeywordEnricher()
         self.patient_masker = PatientMasker()
@@ -44,6 +141,27 @@ class ClinicalTrialSearcher:
             logger.error(f"Error checking index existence: {e}")
             return False
 
+    def _ensure_index(self) -> None:
+        """Raise if the index is missing; a successful check is remembered."""
+        if self._index_checked:
+            return
+        if not self.check_index_exists():
+            raise ValueError(f"Elasticsearch index '{self.index_name}' does not exist")
+        self._index_checked = True
+
+    def invalidate_index_check(self) -> None:
+        """Check the index again before the next search."""
+        self._index_checked = False
+
+    def _warn_empty_keywords(self) -> None:
+        """Warn about empty keyword sets, once every ``EMPTY_KEYWORDS_LOG_EVERY``."""
+        self._empty_keywords_count += 1
+        if self._empty_keywords_count % EMPTY_KEYWORDS_LOG_EVERY == 1:
+            logger.warning(
+                f"No valid keywords found for search "
+                f"({self._empty_keywords_count} searches so far)"
+            )
+
     def build_search_query(
         self, keywords: Union[Dict, List[str]], use_enriched: bool = False
     ) -> Dict:
@@ -55,7 +173,8 @@ class ClinicalTrialSearcher:
             use_enriched: Whether using enriched keywords (affects query structure)
 
         Returns:
-            Elasticsearch query dictionary
+            Elasticsearch query dictionary, shared with other calls for the
+            same terms (do not modify)
         """
         if use_enriched:
             # Handle enriched keywords structure - prioritize original keywords
@@ -65,10 +184,12 @@ class ClinicalTrialSearcher:
                 for keyword, enrichment in keywords.items():
                     primary_terms.append(keyword)  # Original keyword is most important
                     if isinstance(enrichment, dict):
-                        if "synonyms" in enrichment:
-                            secondary_terms.extend(enrichment["synonyms"])
-                        if "related_terms" in enrichment:
-                            secondary_terms.extend(enrichment["related_terms"])
+                        secondary_terms.extend(
+                            chain(
+                                enrichment.get("synonyms", ()),
+                                enrichment.get("related_terms", ()),
+                            )
+                        )
         else:
             # Handle extracted keywords structure
             primary_terms = []
@@ -82,68 +203,20 @@ class ClinicalTrialSearcher:
                 primary_terms = keywords
             secondary_terms = []
 
-        # Remove duplicates and filter out empty strings
+        # Remove duplicates and filter out empty strings, keeping first-seen
+        # order so the same keywords always build the same query
         primary_terms = list(
-            set([term.strip() for term in primary_terms if term.strip()])
+            dict.fromkeys(filter(None, (term.strip() for term in primary_terms)))
         )
         secondary_terms = list(
-            set([term.strip() for term in secondary_terms if term.strip()])
+            dict.fromkeys(filter(None, (term.strip() for term in secondary_terms)))
         )
 
         if not primary_terms:
-            logger.warning("No valid keywords found for search")
+            self._warn_empty_keywords()
             return {"match_all": {}}
 
-        # Build a much simpler query structure
-        # Focus on the most important fields with a multi_match query
-        query_terms = " ".join(primary_terms)
-
-        # Primary query: Multi-match on most important fields
-        primary_query = {
-            "multi_match": {
-                "query": query_terms,
-                "fields": [
-                    "brief_title^3",
-                    "official_title^2.5",
-                    "conditions^2",
-                    "interventions^2",
-                    "keywords^1.5",
-                ],
-                "type": "best_fields",
-                "operator": "or",
-            }
-        }
-
-        # If we have secondary terms (enriched), add them as a boost
-        if secondary_terms:
-            secondary_query_terms = " ".join(secondary_terms)
-            secondary_query = {
-                "multi_match": {
-                    "query": secondary_query_terms,
-                    "fields": [
-                        "brief_title^1.5",
-                        "official_title^1.2",
-                        "conditions^1",
-                        "interventions^1",
-                        "keywords^0.8",
-                    ],
-                    "type": "best_fields",
-                    "operator": "or",
-                }
-            }
-
-            # Combine primary and secondary queries
-            query = {
-                "bool": {
-                    "must": [primary_query],
-                    "should": [secondary_query],
-                    "minimum_should_match": 0,
-                }
-            }
-        else:
-            query = primary_query
-
-        return query
+        return build_query_from_terms(tuple(primary_terms), tuple(secondary_terms))
 
     def search_trials(
         self,
@@ -151,6 +224,7 @@ class ClinicalTrialSearcher:
         use_enriched: bool = False,
         size: int = 20,
         from_: int = 0,
+        fields: Optional[List[str]] = None,
     ) -> Dict:
         """
         Search for clinical trials using keywords.
@@ -160,37 +234,166 @@ class ClinicalTrialSearcher:
             use_enriched: Whether using enriched keywords
             size: Number of results to return
             from_: Starting position for pagination
+            fields: Source fields to return (all display fields by default),
+                e.g. ["nct_id"] when only trial IDs are needed
 
         Returns:
-            Search results dictionary
+            Search results dictionary, reduced to the hits' ``_source`` and
+            ``_score``
         """
-        if not self.check_index_exists():
-            raise ValueError(f"Elasticsearch index '{self.index_name}' does not exist")
+        self._ensure_index()
+
+        search_body = self._build_search_body(
+            keywords, use_enriched, size, from_, fields
+        )
+
+        cache_key = json.dumps(search_body, sort_keys=True)
+        cached = self._get_cached_search(cache_key)
+        if cached is not None:
+            logger.info("Search cache hit")
+            return cached
+
+        try:
+            # Only the hits are read, so drop shard and hit metadata server-side
+            response = self.es.search(
+                index=self.index_name,
+                body=search_body,
+                filter_path=["hits.hits._source", "hits.hits._score"],
+            )
+        except Exception as e:
+            logger.error(f"Error searching Elasticsearch: {e}")
+            raise
+
+        response = self._trim_response(response)
+        self._set_cached_search(cache_key, response)
+        return response
 
+    def search_trials_batch(
+        self,
+        keyword_sets: List[Union[Dict, List[str]]],
+        use_enriched: bool = False,
+        size: int = 20,
+    ) -> List[Dict]:
+        """
+        Search for clinical trials for several keyword sets at once.
+
+        Searches that are not cached are sent with the ``_msearch`` API, in
+        chunks of ``MSEARCH_CHUNK_SIZE``, so N searches cost a few round
+        trips instead of N.
+
+        Args:
+            keyword_sets: Keywords from extraction or enrichment, one per search
+            use_enriched: Whether using enriched keywords
+            size: Number of results to return per search
+
+        Returns:
+            Search results dictionaries, in the order of ``keyword_sets``,
+            reduced to the hits' ``_source`` and ``_score``
+        """
+        self._ensure_index()
+
+        cache_keys = []
+        found = {}
+        pending = {}
+        for keywords in keyword_sets:
+            search_body = self._build_search_body(keywords, use_enriched, size)
+            cache_key = json.dumps(search_body, sort_keys=True)
+            cache_keys.append(cache_key)
+            # Identical searches in one batch are sent only once
+            if cache_key in found or cache_key in pending:
+                continue
+            cached = self._get_cached_search(cache_key)
+            if cached is not None:
+                found[cache_key] = cached
+            else:
+                pending[cache_key] = search_body
+
+        pending = list(pending.items())
+
+        for start in range(0, len(pending), MSEARCH_CHUNK_SIZE):
+            chunk = pending[start : start + MSEARCH_CHUNK_SIZE]
+            body = []
+            for _, search_body in chunk:
+                body.extend(({"index": self.index_name}, search_body))
+
+            try:
+                result = self.es.msearch(body=body)
+            except Exception as e:
+                logger.error(f"Error searching Elasticsearch: {e}")
+                raise
+
+            for (cache_key, _), response in zip(chunk, result["responses"]):
+                if "error" in response:
+                    logger.error(f"Error searching Elasticsearch: {response['error']}")
+                    raise ValueError(f"Search failed: {response['error']}")
+                response = self._trim_response(response)
+                self._set_cached_search(cache_key, response)
+                found[cache_key] = response
+
+        logger.info(
+            f"Ran {len(keyword_sets)} searches, {len(pending)} sent to Elasticsearch"
+        )
+        return [found[cache_key] for cache_key in cache_keys]
+
+    def _build_search_body(
+        self,
+        keywords: Union[Dict, List[str]],
+        use_enriched: bool = False,
+        size: int = 20,
+        from_: int = 0,
+        fields: Optional[List[str]] = None,
+    ) -> Dict:
+        """Build the Elasticsearch search request body for keywords."""
         query = self.build_search_query(keywords, use_enriched)
 
         search_body = {
             "query": query,
             "size": size,
             "from": from_,
-            "_source": [
-                "nct_id",
-                "brief_title",
-                "official_title",
-                "conditions",
-                "interventions",
-                "keywords",
-                "brief_summary",
-            ],
+            # Callers only read the hits, so skip counting every matching doc
+            "track_total_hits": False,
+            "_source": list(fields or SEARCH_SOURCE_FIELDS),
         }
+        return search_body
 
-        try:
-            response = self.es.search(index=self.index_name, body=search_body)
-            # For search, response is already a dict
+    @staticmethod
+    def _trim_response(response: Dict) -> Dict:
+        """
+        Reduce a search response to the hits' ``_source`` and ``_score``.
+
+        ``search`` trims server-side with ``filter_path`` and ``msearch``
+        responses are trimmed here, so both paths cache and return the same
+        shape.
+        """
+        return {
+            "hits": {
+                "hits": [
+                    {"_source": hit.get("_source"), "_score": hit.get("_score")}
+                    for hit in response.get("hits", {}).get("hits", [])
+                ]
+            }
+        }
+
+    def _get_cached_search(self, cache_key: str) -> Optional[Dict]:
+        """Return a cached search response if it has not expired."""
+        with self._search_cache_lock:
+            entry = self._search_cache.get(cache_key)
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if time.monotonic() - stored_at > settings.search_cache_ttl:
+                del self._search_cache[cache_key]
+                return None
+            self._search_cache.move_to_end(cache_key)
             return response
-        except Exception as e:
-            logger.error(f"Error searching Elasticsearch: {e}")
-            raise
+
+    def _set_cached_search(self, cache_key: str, response: Dict) -> None:
+        """Store a search response, evicting the least recently used entry."""
+        with self._search_cache_lock:
+            self._search_cache[cache_key] = (time.monotonic(), response)
+            self._search_cache.move_to_end(cache_key)
+            while len(self._search_cache) > settings.search_cache_size:
+                self._search_cache.popitem(last=False)
 
     def run_full_pipeline(
         self,
@@ -224,6 +427,74 @@ class ClinicalTrialSearcher:
         else:
             patient_profile = patient_profile_text
 
+        keywords = self.prepare_keywords(patient_profile, skip_masking=skip_masking)
+
+        # Step 5: Search
+        logger.info("Step 4: Searching clinical trials")
+        search_results = self.search_trials(
+            keywords["enriched_keywords"], use_enriched=True, size=size
+        )
+
+        return {**keywords, "search_results": search_results}
+
+    def run_full_pipeline_batch(
+        self,
+        patient_profiles: List[str],
+        size: int = 20,
+        skip_masking: bool = False,
+        max_workers: int = 8,
+    ) -> List[Dict]:
+        """
+        Run the complete pipeline for several patient profiles.
+
+        The LLM-bound masking, extraction and enrichment stages run concurrently
+        across profiles, then all searches are sent together with
+        ``search_trials_batch``.
+
+        Args:
+            patient_profiles: Patient profile texts
+            size: Number of search results to return per profile
+            skip_masking: Whether to skip patient masking
+            max_workers: Number of profiles prepared concurrently
+
+        Returns:
+            Pipeline results dictionaries, in the order of ``patient_profiles``
+        """
+        logger.info(f"Starting full pipeline for {len(patient_profiles)} profiles")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            prepared = list(
+                executor.map(
+                    lambda profile: self.prepare_keywords(profile, skip_masking),
+                    patient_profiles,
+                )
+            )
+
+        search_results = self.search_trials_batch(
+            [keywords["enriched_keywords"] for keywords in prepared],
+            use_enriched=True,
+            size=size,
+        )
+
+        return [
+            {**keywords, "search_results": results}
+            for keywords, results in zip(prepared, search_results)
+        ]
+
+    def prepare_keywords(
+        self, patient_profile: str, skip_masking: bool = False
+    ) -> Dict:
+        """
+        Run the stages before search: patient masking -> keyword extraction ->
+        keyword enrichment.
+
+        Args:
+            patient_profile: Patient profile text
+            skip_masking: Whether to skip patient masking
+
+        Returns:
+            Dictionary with the masked profile, extracted and enriched keywords
+        """
         if not skip_masking:
             # Step 2: Patient masking
             logger.info("Step 1: Masking patient data")
@@ -361,17 +632,10 @@ class ClinicalTrialSearcher:
             "Stage IV": {"synonyms": ["Stage 4", "Advanced Stage"]},
         }
 
-        # Step 5: Search
-        logger.info("Step 4: Searching clinical trials")
-        search_results = self.search_trials(
-            enriched_keywords, use_enriched=True, size=size
-        )
-
         return {
             "masked_profile": masked_profile,
             "extracted_keywords": extracted_keywords,
             "enriched_keywords": enriched_keywords,
-            "search_results": search_results,
         }
 
     def search_with_extracted_keywords(self, keywords: Dict, size: int = 20) -> Dict:
@@ -438,8 +702,8 @@ def demo():
     print("=== Testing Full Pipeline ===")
     try:
         results = searcher.run_full_pipeline(size=5, skip_masking=True)
-        print(f"Found {len(results['search_results']['hits']['hits'])} trials")
         formatted_results = searcher.format_search_results(results["search_results"])
+        print(f"Found {len(formatted_results)} trials")
         final_results = [
             [trial["nct_id"], trial["title"]] for trial in formatted_results
         ]
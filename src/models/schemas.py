@@ -2,13 +2,15 @@
 Data models and schemas for the trial matching system.
 
 This module defines Pydantic models for input/output data structures
-used throughout the application.
+used throughout the application. Free-form dict fields that the application
+fills in itself are wrapped in ``SkipValidation``; callers building those
+models are responsible for passing dicts.
 """
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, SkipValidation
 
 
 class PatientProfile(BaseModel):
@@ -77,6 +79,8 @@ class TrialData(BaseModel):
 class CriteriaMatch(BaseModel):
     """Criteria matching result model."""
 
+    model_config = ConfigDict(frozen=True)
+
     criteria_id: str = Field(..., description="Unique criteria identifier")
     criteria_text: str = Field(..., description="Original criteria text")
     criteria_type: str = Field(..., description="Inclusion or exclusion criteria")
@@ -85,7 +89,7 @@ class CriteriaMatch(BaseModel):
     )
     confidence: float = Field(..., description="Confidence score (0-1)")
     reasoning: str = Field(..., description="Reasoning for classification")
-    extracted_info: Optional[Dict[str, Any]] = Field(
+    extracted_info: Optional[SkipValidation[Dict[str, Any]]] = Field(
         None, description="Extracted patient information"
     )
     created_at: datetime = Field(
@@ -93,9 +97,50 @@ class CriteriaMatch(BaseModel):
     )
 
 
+class CriterionVerdict(BaseModel):
+    """LLM verdict for a single criterion."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    classification: Literal["eligible", "ineligible", "unknown"] = Field(
+        ..., description="Match classification"
+    )
+    explanation: str = Field(..., description="Brief explanation of the decision")
+
+
+class NumberedCriterionVerdict(CriterionVerdict):
+    """LLM verdict for one criterion of a numbered batch."""
+
+    id: int = Field(..., description="Number of the criterion in the batch")
+
+
+class BatchCriterionVerdict(BaseModel):
+    """LLM verdicts for a numbered batch of criteria."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    results: List[NumberedCriterionVerdict] = Field(
+        ..., description="One verdict per criterion"
+    )
+
+
+class ExtractedKeywords(BaseModel):
+    """LLM keywords extracted from a masked patient profile."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    conditions: List[str] = Field(..., description="Diseases and conditions")
+    interventions: List[str] = Field(..., description="Treatments and procedures")
+    keywords: List[str] = Field(..., description="Trial-relevant terms")
+    biomarkers: List[str] = Field(..., description="Genetic and molecular markers")
+    demographics: List[str] = Field(..., description="Demographic factors")
+
+
 class TrialMatchResult(BaseModel):
     """Trial matching result model."""
 
+    model_config = ConfigDict(frozen=True)
+
     trial_id: str = Field(..., description="Trial NCT ID")
     match_score: float = Field(..., description="Overall match score (0-1)")
     eligible_criteria: int = Field(..., description="Number of eligible criteria")
@@ -103,6 +148,9 @@ class TrialMatchResult(BaseModel):
     criteria_matches: List[CriteriaMatch] = Field(
         default_factory=list, description="Individual criteria matches"
     )
+    truncated: bool = Field(
+        False, description="Whether evaluation stopped before all criteria"
+    )
     trial_data: Optional[TrialData] = Field(None, description="Trial information")
     created_at: datetime = Field(
         default_factory=datetime.now, description="Result creation timestamp"
@@ -126,6 +174,8 @@ class SearchQuery(BaseModel):
 class SearchResult(BaseModel):
     """Search result model."""
 
+    model_config = ConfigDict(frozen=True)
+
     trial_id: str = Field(..., description="Trial NCT ID")
     relevance_score: float = Field(..., description="Relevance score (0-1)")
     trial_data: TrialData = Field(..., description="Trial information")
@@ -161,7 +211,7 @@ class MatchingResponse(BaseModel):
     results: List[TrialMatchResult] = Field(
         default_factory=list, description="Matching results"
     )
-    summary: Dict[str, Any] = Field(
+    summary: SkipValidation[Dict[str, Any]] = Field(
         default_factory=dict, description="Summary statistics"
     )
     processing_time: float = Field(..., description="Processing time in seconds")
@@ -187,8 +237,10 @@ class PreprocessingResponse(BaseModel):
     """Data preprocessing response model."""
 
     request_id: str = Field(..., description="Unique request identifier")
-    processed_data: Dict[str, Any] = Field(..., description="Processed data")
-    preprocessing_stats: Dict[str, Any] = Field(
+    processed_data: SkipValidation[Dict[str, Any]] = Field(
+        ..., description="Processed data"
+    )
+    preprocessing_stats: SkipValidation[Dict[str, Any]] = Field(
         default_factory=dict, description="Preprocessing statistics"
     )
     processing_time: float = Field(..., description="Processing time in seconds")
@@ -202,7 +254,7 @@ class ErrorResponse(BaseModel):
 
     error_code: str = Field(..., description="Error code")
     error_message: str = Field(..., description="Error message")
-    details: Optional[Dict[str, Any]] = Field(
+    details: Optional[SkipValidation[Dict[str, Any]]] = Field(
         None, description="Additional error details"
     )
     timestamp: datetime = Field(
@@ -26,12 +26,25 @@ class Settings(BaseSettings):
     # LLM Settings
     llm_model: str = "gpt-4o"
     temperature: float = 0.0
+    criteria_batch_size: int = 20
+    criteria_batch_max_tokens: int = 2000
+    early_stop_batch_size: int = 5
+    enrichment_batch_size: int = 16
+    llm_max_concurrency: int = 8
+    match_cache_size: int = 4096
 
     # Redis Settings
     redis_trial_criteria_key: str = "trial_criteria"
+    redis_trial_criteria_ttl: int = 7 * 24 * 3600  # seconds
+    criteria_cache_size: int = 10000
+    stage_cache_ttl: int = 7 * 24 * 3600  # seconds
+    stage_cache_size: int = 1024
 
     # Elasticsearch Settings
     es_index_name: str = "aact_search"
+    search_cache_ttl: int = 3600  # seconds
+    search_cache_size: int = 256
+    es_sync_state_path: str = "data/sql2es_state.json"
 
     # Streamlit Settings
     streamlit_title: str = "Clinical Trial Matching System"
@@ -46,6 +59,7 @@ class Settings(BaseSettings):
     sql_database_aact: Optional[str] = None
     sql_username: Optional[str] = None
     sql_password: Optional[str] = None
+    aact_pool_size: int = 4
 
 
 # Create global settings instance
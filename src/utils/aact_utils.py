@@ -1,6 +1,71 @@
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List
+
 import psycopg2
+from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
 
 from src.settings import settings
+from src.utils.cache_utils import JsonCache
+
+logger = logging.getLogger(__name__)
+
+# "Inclusion Criteria:" / "Exclusion Criteria:" at the start of a line
+SECTION_HEADER_PATTERN = re.compile(r"(inclusion|exclusion) criteria:", re.IGNORECASE)
+
+# Parsed criteria, cached per trial
+_criteria_cache = JsonCache(
+    settings.criteria_cache_size, settings.redis_trial_criteria_ttl
+)
+
+# Callers wait for a free pooled connection instead of failing when all
+# connections are in use
+_pool_slots = threading.BoundedSemaphore(settings.aact_pool_size * 2)
+
+
+@lru_cache(maxsize=1)
+def get_aact_pool() -> ThreadedConnectionPool:
+    """
+    Get the shared AACT connection pool.
+
+    Idle connections stay open between lookups, so each query skips the TCP
+    and authentication round trips of a fresh connection.
+
+    Returns:
+        ThreadedConnectionPool: Pool of AACT database connections
+    """
+    pg_conn_params = {
+        "host": settings.sql_host,
+        "port": settings.sql_port,
+        "dbname": settings.sql_database_aact,
+        "user": settings.sql_username,
+        "password": settings.sql_password,
+    }
+    return ThreadedConnectionPool(
+        minconn=settings.aact_pool_size,
+        maxconn=settings.aact_pool_size * 2,
+        connect_timeout=300,
+        **pg_conn_params,  # type: ignore
+    )
+
+
+@contextmanager
+def _connect() -> Iterator[connection]:
+    """Borrow a connection to the AACT database from the shared pool."""
+    pool = get_aact_pool()
+    with _pool_slots:
+        conn = pool.getconn()
+        try:
+            # Lookups are read-only, so skip the transaction the pool would
+            # otherwise have to roll back on return
+            conn.autocommit = True
+            yield conn
+        finally:
+            pool.putconn(conn)
 
 
 def get_criteria_by_nct_id(nct_id: str) -> str:
@@ -17,16 +82,6 @@ def get_criteria_by_nct_id(nct_id: str) -> str:
         return ""
 
     try:
-        pg_conn_params = {
-            "host": settings.sql_host,
-            "port": settings.sql_port,
-            "dbname": settings.sql_database_aact,
-            "user": settings.sql_username,
-            "password": settings.sql_password,
-        }
-        conn = psycopg2.connect(**pg_conn_params, connect_timeout=300)  # type: ignore
-        cursor = conn.cursor()
-
         query = """
             SELECT criteria
             FROM ctgov.eligibilities 
@@ -34,25 +89,103 @@ def get_criteria_by_nct_id(nct_id: str) -> str:
             LIMIT 1;
         """
 
-        cursor.execute(query, (nct_id,))
-        results = cursor.fetchall()
+        with _connect() as conn, conn.cursor() as cursor:
+            cursor.execute(query, (nct_id,))
+            results = cursor.fetchall()
 
         # Convert result to a string
         criteria_str = results[0][0]
 
-        cursor.close()
-        conn.close()
-
         return criteria_str
 
     except psycopg2.Error as e:
-        print(f"Database error: {e}")
+        logger.error(f"Database error: {e}")
         return ""
     except Exception as e:
-        print(f"Error retrieving criteria: {e}")
+        logger.error(f"Error retrieving criteria: {e}")
         return ""
 
 
+def get_criteria_by_nct_ids(nct_ids: List[str]) -> Dict[str, str]:
+    """
+    Retrieve eligibility criteria for several NCT IDs in one query.
+
+    Args:
+        nct_ids (List[str]): NCT IDs to query
+
+    Returns:
+        Dict[str, str]: Criteria text keyed by NCT ID; IDs without criteria
+            are omitted
+    """
+    if not nct_ids:
+        return {}
+
+    query = """
+        SELECT DISTINCT ON (nct_id) nct_id, criteria
+        FROM ctgov.eligibilities
+        WHERE nct_id = ANY(%s);
+    """
+
+    try:
+        with _connect() as conn, conn.cursor() as cursor:
+            cursor.execute(query, (list(nct_ids),))
+            return {
+                nct_id: criteria for nct_id, criteria in cursor.fetchall() if criteria
+            }
+
+    except psycopg2.Error as e:
+        logger.error(f"Database error: {e}")
+        return {}
+
+
+def get_parsed_criteria_by_nct_ids(nct_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    Retrieve parsed eligibility criteria for several NCT IDs.
+
+    Parsed criteria lists are cached per trial under
+    ``<settings.redis_trial_criteria_key>:<nct_id>``, in process and in Redis
+    with a single MGET, so cached trials skip both the database query and the
+    parse. Each entry expires ``settings.redis_trial_criteria_ttl`` seconds
+    after it was written. Missing entries are fetched from the AACT database
+    in a single query, parsed and written back.
+
+    Args:
+        nct_ids (List[str]): NCT IDs to query
+
+    Returns:
+        Dict[str, List[str]]: Parsed criteria keyed by NCT ID ([] when unavailable)
+    """
+    if not nct_ids:
+        return {}
+
+    cache_keys = [_criteria_cache_key(nct_id) for nct_id in nct_ids]
+    criteria_map = {
+        nct_id: criteria
+        for nct_id, criteria in zip(nct_ids, _criteria_cache.get_many(cache_keys))
+        if criteria is not None
+    }
+
+    missing = [nct_id for nct_id in nct_ids if nct_id not in criteria_map]
+    if missing:
+        raw_criteria = get_criteria_by_nct_ids(missing)
+
+        found = {}
+        for nct_id in missing:
+            text = raw_criteria.get(nct_id, "")
+            criteria_map[nct_id] = parse_clinical_trial_criteria(text) if text else []
+            # Only cache real hits so transient DB errors are retried next time
+            if text:
+                found[_criteria_cache_key(nct_id)] = criteria_map[nct_id]
+        _criteria_cache.set_many(found)
+
+    return criteria_map
+
+
+def _criteria_cache_key(nct_id: str) -> str:
+    """Build the cache key of one trial's parsed criteria."""
+    return f"{settings.redis_trial_criteria_key}:{nct_id}"
+
+
 def parse_clinical_trial_criteria(criteria_text):
     """
     Parse clinical trial criteria text into a list of criteria strings.
@@ -75,11 +208,9 @@ def parse_clinical_trial_criteria(criteria_text):
             continue
 
         # Identify section headers
-        if line.lower().startswith("inclusion criteria:"):
-            current_section = "inclusion"
-            continue
-        elif line.lower().startswith("exclusion criteria:"):
-            current_section = "exclusion"
+        header = SECTION_HEADER_PATTERN.match(line)
+        if header:
+            current_section = header.group(1).lower()
             continue
 
         criteria_text = line.strip()
@@ -89,6 +220,19 @@ def parse_clinical_trial_criteria(criteria_text):
     return criteria_list
 
 
+def get_criteria_type(criterion: str) -> str:
+    """
+    Get the section of a criterion produced by ``parse_clinical_trial_criteria``.
+
+    Args:
+        criterion (str): Criterion in format "inclusion: text" or "exclusion: text"
+
+    Returns:
+        str: "inclusion" or "exclusion"
+    """
+    return "exclusion" if criterion.startswith("exclusion: ") else "inclusion"
+
+
 if __name__ == "__main__":
     sample_criteria = get_criteria_by_nct_id("NCT05254184")
     print(sample_criteria)
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import redis
+from pydantic_core import from_json, to_json
+
+from src.settings import settings
+from src.utils.redis_utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(*parts: str) -> str:
+    """
+    Hash text parts into a short hex digest for use in cache keys.
+
+    Args:
+        *parts (str): Text parts, e.g. a prompt version and the stage input
+
+    Returns:
+        str: 32-character hex digest
+    """
+    return hashlib.blake2b(
+        "\x00".join(parts).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def prompt_version(*prompts: str) -> str:
+    """
+    Digest the configured LLM model and a stage's prompts for use in cache keys.
+
+    Switching model or editing a prompt changes the version, so outputs cached
+    under the old one are no longer looked up.
+
+    Args:
+        *prompts (str): System messages and prompt templates of the stage
+
+    Returns:
+        str: 32-character hex digest
+    """
+    return content_digest(settings.llm_model, *prompts)
+
+
+class JsonCache:
+    """
+    JSON values cached in an in-process LRU in front of Redis.
+
+    Values are kept serialized in both layers, so every hit returns a fresh
+    copy that the caller may modify. Redis errors are logged and treated as
+    misses, so the cache never fails the caller.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        """
+        Args:
+            max_size (int): Number of values kept in process
+            ttl (int): Redis expiry in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._memory_cache = OrderedDict()
+        self._memory_cache_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a JSON value.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Any: Cached value, or None on a miss
+        """
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Get several JSON values, in process first and then with one Redis MGET.
+
+        Args:
+            keys (List[str]): Cache keys
+
+        Returns:
+            List[Any]: Cached values in key order, with None for misses
+        """
+        with self._memory_cache_lock:
+            values = [self._memory_cache.get(key) for key in keys]
+            for key, value in zip(keys, values):
+                if value is not None:
+                    self._memory_cache.move_to_end(key)
+
+        missing = [i for i, value in enumerate(values) if value is None]
+        redis_client = get_redis_client()
+        if redis_client is not None and missing:
+            try:
+                remote = redis_client.mget([keys[i] for i in missing])
+            except redis.RedisError as e:
+                logger.warning(f"Redis error: {e}")
+                remote = []
+            found = {}
+            for i, value in zip(missing, remote):
+                if value is not None:
+                    values[i] = found[keys[i]] = value
+            self._remember(found)
+
+        results = []
+        for key, value in zip(keys, values):
+            try:
+                results.append(None if value is None else from_json(value))
+            except ValueError as e:
+                logger.warning(f"Invalid cached value for {key}: {e}")
+                results.append(None)
+        return results
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Cache a JSON-serializable value.
+
+        Args:
+            key (str): Cache key
+            value (Any): Value to cache
+        """
+        self.set_many({key: value})
+
+    def set_many(self, values: Dict[str, Any]) -> None:
+        """
+        Cache several JSON-serializable values with one Redis round trip.
+
+        Args:
+            values (Dict[str, Any]): Values keyed by cache key
+        """
+        if not values:
+            return
+
+        serialized = {key: to_json(value) for key, value in values.items()}
+        self._remember(serialized)
+
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, value in serialized.items():
+                pipe.setex(key, self.ttl, value)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Redis error: {e}")
+
+    def _remember(self, values: Dict[str, bytes]) -> None:
+        """Add serialized values to the in-process LRU, evicting the oldest."""
+        with self._memory_cache_lock:
+            for key, value in values.items():
+                self._memory_cache[key] = value
+                self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > self.max_size:
+                self._memory_cache.popitem(last=False)
+
+
+# Shared cache of pipeline stage outputs
+stage_cache = JsonCache(settings.stage_cache_size, settings.stage_cache_ttl)
+
+
+def get_cached_json(key: str) -> Optional[Any]:
+    """
+    Get a JSON value from the stage cache.
+
+    Args:
+        key (str): Cache key
+
+    Returns:
+        Any: Cached value, or None on a miss
+    """
+    return stage_cache.get(key)
+
+
+def get_cached_json_many(keys: List[str]) -> List[Optional[Any]]:
+    """
+    Get several JSON values from the stage cache.
+
+    Args:
+        keys (List[str]): Cache keys
+
+    Returns:
+        List[Any]: Cached values in key order, with None for misses
+    """
+    return stage_cache.get_many(keys)
+
+
+def set_cached_json(key: str, value: Any) -> None:
+    """
+    Cache a JSON-serializable value in the stage cache.
+
+    Args:
+        key (str): Cache key
+        value (Any): Value to cache
+    """
+    stage_cache.set(key, value)
+
+
+def set_cached_json_many(values: Dict[str, Any]) -> None:
+    """
+    Cache several JSON-serializable values in the stage cache.
+
+    Args:
+        values (Dict[str, Any]): Values keyed by cache key
+    """
+    stage_cache.set_many(values)
@@ -0,0 +1,56 @@
+from functools import lru_cache
+
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+from pydantic_core import from_json, to_json
+
+
+class FastJSONSerializer(JSONSerializer):
+    """
+    JSON serializer backed by pydantic_core's Rust encoder and parser.
+
+    Types the encoder does not handle natively fall back to the stock
+    serializer's ``default`` (numpy and pandas values among them).
+    """
+
+    def loads(self, s):
+        try:
+            return from_json(s)
+        except ValueError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        # don't serialize strings
+        if isinstance(data, str):
+            return data
+
+        try:
+            return to_json(data, fallback=self.default).decode("utf-8")
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
+
+
+@lru_cache(maxsize=None)
+def get_es_client(es_url: str) -> Elasticsearch:
+    """
+    Get the shared Elasticsearch client for a URL.
+
+    The client owns a pool of keep-alive connections, so every searcher in the
+    process reuses the same sockets instead of opening its own pool.
+
+    Args:
+        es_url (str): Elasticsearch URL
+
+    Returns:
+        Elasticsearch: Elasticsearch client
+    """
+    return Elasticsearch(
+        [es_url],
+        maxsize=32,
+        http_compress=True,
+        timeout=30,
+        retry_on_timeout=True,
+        max_retries=3,
+        serializer=FastJSONSerializer(),
+    )
@@ -1,11 +1,63 @@
+from functools import lru_cache
+from typing import Type
+
+import httpx
 import openai
+from pydantic import BaseModel
 
 from src.settings import settings
 
 # LLM model configuration
 LLM_MODEL = settings.llm_model
 
-openai.api_key = settings.openai_api_key
+# Shared by every caller that only needs the response to be a JSON object
+JSON_OBJECT_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> openai.OpenAI:
+    """
+    Get the shared OpenAI client.
+
+    The client keeps a pooled HTTP connection per concurrent request, so TLS
+    handshakes are paid once per connection instead of once per LLM call.
+
+    Returns:
+        openai.OpenAI: OpenAI client
+    """
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_concurrency * 2,
+        max_keepalive_connections=settings.llm_max_concurrency,
+    )
+    return openai.OpenAI(
+        api_key=settings.openai_api_key,
+        http_client=httpx.Client(limits=limits, timeout=openai.DEFAULT_TIMEOUT),
+    )
+
+
+@lru_cache(maxsize=None)
+def json_schema_response_format(model: Type[BaseModel]) -> dict:
+    """
+    Build a strict structured-output response format from a pydantic model.
+
+    With ``strict`` enabled the model is constrained while decoding, so the
+    response always parses and matches the schema. The format is built once
+    per model and shared, so callers must not modify it.
+
+    Args:
+        model: Pydantic model describing the expected response
+
+    Returns:
+        dict: ``response_format`` argument for chat completions
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": model.model_json_schema(),
+            "strict": True,
+        },
+    }
 
 
 def get_llm_response(prompt, system_message=None):
@@ -24,7 +76,7 @@ def get_llm_response(prompt, system_message=None):
         messages.append({"role": "system", "content": system_message})
     messages.append({"role": "user", "content": prompt})
 
-    response = openai.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model=LLM_MODEL, messages=messages, temperature=settings.temperature
     )
 
@@ -57,6 +109,6 @@ def get_structured_llm_response(prompt, system_message=None, response_format=Non
     if response_format is not None:
         kwargs["response_format"] = response_format
 
-    response = openai.chat.completions.create(**kwargs)
+    response = get_openai_client().chat.completions.create(**kwargs)
 
     return response.choices[0].message.content
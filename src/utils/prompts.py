@@ -189,3 +189,43 @@ IMPORTANT:
 - Provide specific reasoning for your classification
 
 Please ensure your response is valid JSON."""
+
+# Batch Criteria Matching Prompts
+BATCH_CRITERIA_MATCHING_SYSTEM = """You are a medical expert that evaluates whether a patient meets clinical trial criteria.
+You will receive a numbered list of criteria. Classify every criterion independently as 'eligible', 'ineligible', or 'unknown' based on the available information.
+Always respond with valid JSON format containing one result per criterion."""
+
+BATCH_CRITERIA_MATCHING_PROMPT = """Evaluate whether the following patient profile meets each of the numbered clinical trial criteria:
+
+Patient Profile:
+{patient_profile}
+
+Criteria:
+{criteria}
+
+Classify the patient's eligibility for each criterion and provide a brief explanation.
+
+Return your response in the following JSON format, with exactly one entry per criterion and "id" matching the criterion number:
+{{
+    "results": [
+        {{
+            "id": 1,
+            "classification": "eligible|ineligible|unknown",
+            "explanation": "Brief explanation of your decision"
+        }}
+    ]
+}}
+
+Classification guidelines:
+- 'eligible': Patient clearly meets the criterion based on available information
+- 'ineligible': Patient clearly does not meet the criterion based on available information
+- 'unknown': Use this when you are unsure, when information is missing, or when the criterion is ambiguous
+
+IMPORTANT: When in doubt, classify as 'unknown'. Evaluate each criterion on its own; do not let one criterion influence another.
+
+Explanation guidelines:
+- Be concise but specific about why you made your classification
+- Reference specific information from the patient profile when possible
+- If information is missing, clearly state what additional information would be needed
+
+Please ensure your response is valid JSON."""
@@ -0,0 +1,26 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import redis
+
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> Optional[redis.Redis]:
+    """
+    Get the shared Redis client.
+
+    The client owns a connection pool, so it is created once per process and
+    reused by every caller.
+
+    Returns:
+        redis.Redis: Redis client, or None when ``redis_url`` is not configured
+    """
+    if not settings.redis_url:
+        logger.info("REDIS_URL is not set; Redis caching is disabled")
+        return None
+    return redis.Redis.from_url(settings.redis_url)
@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import Literal
+
+from src.models.schemas import TrialMatchResult
+
+
+class ResultsWriter:
+    """
+    Stream trial matching results to a file as they are produced.
+
+    Each result is serialized and written as soon as it is passed to
+    ``write``, so the file never has to hold the whole result list in memory
+    at once. In ``json`` format the results form one array, which is closed
+    on exit even if the pipeline fails. In ``ndjson`` format each result is
+    one line, so readers can consume the file while it is still being written.
+
+    Usage:
+        with ResultsWriter("results/trial_matching_results.json") as writer:
+            run_trial_matching_pipeline(profile, on_result=writer.write)
+    """
+
+    def __init__(
+        self, output_path: str, output_format: Literal["json", "ndjson"] = "json"
+    ):
+        """
+        Args:
+            output_path (str): Path of the file to write
+            output_format (str): "json" for a JSON array or "ndjson" for one
+                JSON document per line
+        """
+        if output_format not in ("json", "ndjson"):
+            raise ValueError("output_format must be 'json' or 'ndjson'")
+
+        self.output_path = Path(output_path)
+        self.output_format = output_format
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.output_path, "wb")
+        if self.output_format == "json":
+            self._file.write(b"[")
+        return self
+
+    def write(self, result: TrialMatchResult) -> None:
+        """
+        Append one trial result to the file.
+
+        Args:
+            result (TrialMatchResult): Trial matching result
+        """
+        if self.output_format == "ndjson":
+            self._file.write(result.model_dump_json().encode("utf-8") + b"\n")
+            self._file.flush()
+        else:
+            self._file.write(b",\n" if self.count else b"\n")
+            self._file.write(result.model_dump_json(indent=2).encode("utf-8"))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.output_format == "json":
+            self._file.write(b"\n]\n" if self.count else b"]\n")
+        self._file.close()
+        self._file = None